@@ -0,0 +1,232 @@
+"""Local stand-ins for the OpenAI and Serper APIs, for load tests that cost nothing.
+
+Serves an OpenAI-compatible ``/v1/chat/completions`` (streaming and not),
+``/v1/embeddings`` and a Serper-style ``/search``. Latencies are drawn from
+log-normal distributions and completions stream at a fixed token rate, so
+the backend sees realistic time to first token and generation time. The same
+endpoint also stands in for Anthropic's OpenAI-compatible API.
+
+Usage:
+    python fake_providers.py [--port 9100] [--ttft 0.4] [--tokens-per-second 50]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+
+@dataclass
+class Profile:
+    # Median and log-normal sigma of the time to first token
+    ttft_median: float = 0.4
+    ttft_sigma: float = 0.5
+    tokens_per_second: float = 50.0
+    # Completion length when the request's max_tokens allows it
+    completion_tokens: int = 200
+    embedding_latency: float = 0.05
+    search_latency: float = 0.3
+    latency_sigma: float = 0.3
+    # Share of calls answered with a 500 before any token
+    error_rate: float = 0.0
+
+
+profile = Profile()
+app = FastAPI(title="Fake LLM providers")
+counters = {"chat": 0, "embeddings": 0, "search": 0, "errors": 0}
+
+WORDS = (
+    "the quick brown fox jumps over lazy dogs while streaming tokens "
+    "arrive at a steady rate from the fake provider"
+).split()
+
+
+def lognormal(median: float, sigma: float) -> float:
+    return random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+def maybe_fail() -> None:
+    if random.random() < profile.error_rate:
+        counters["errors"] += 1
+        raise HTTPException(500, "injected failure")
+
+
+def completion_length(body: dict) -> int:
+    requested = body.get("max_tokens") or profile.completion_tokens
+    return max(1, min(requested, profile.completion_tokens))
+
+
+def prompt_length(body: dict) -> int:
+    # Close enough to a tokenizer for usage accounting
+    return sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+
+
+def chunk(model: str, completion_id: str, delta: dict, finish=None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [
+            {"index": 0, "delta": delta, "finish_reason": finish}
+        ],
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def stream_tokens(body: dict):
+    model = body.get("model", "fake")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    n = completion_length(body)
+    await asyncio.sleep(lognormal(profile.ttft_median, profile.ttft_sigma))
+    yield chunk(model, completion_id, {"role": "assistant", "content": ""})
+    interval = 1.0 / profile.tokens_per_second
+    start = time.monotonic()
+    for i in range(n):
+        yield chunk(model, completion_id, {"content": WORDS[i % len(WORDS)] + " "})
+        # Pace against the start time so scheduling delays don't accumulate
+        delay = start + (i + 1) * interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    yield chunk(model, completion_id, {}, finish="stop")
+    if (body.get("stream_options") or {}).get("include_usage"):
+        prompt = prompt_length(body)
+        yield chunk(
+            model,
+            completion_id,
+            {},
+            usage={
+                "prompt_tokens": prompt,
+                "completion_tokens": n,
+                "total_tokens": prompt + n,
+            },
+        )
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["chat"] += 1
+    maybe_fail()
+    if body.get("stream"):
+        return StreamingResponse(stream_tokens(body), media_type="text/event-stream")
+    n = completion_length(body)
+    ttft = lognormal(profile.ttft_median, profile.ttft_sigma)
+    await asyncio.sleep(ttft + n / profile.tokens_per_second)
+    prompt = prompt_length(body)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": " ".join(WORDS[i % len(WORDS)] for i in range(n)),
+                },
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt,
+            "completion_tokens": n,
+            "total_tokens": prompt + n,
+        },
+    }
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    # Deterministic per text, so identical queries embed identically
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    counters["embeddings"] += 1
+    maybe_fail()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dim = body.get("dimensions") or 1536
+    await asyncio.sleep(lognormal(profile.embedding_latency, profile.latency_sigma))
+    return {
+        "object": "list",
+        "model": body.get("model", "fake"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, dim)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/search")
+async def search(request: Request):
+    body = await request.json()
+    counters["search"] += 1
+    maybe_fail()
+    await asyncio.sleep(lognormal(profile.search_latency, profile.latency_sigma))
+    query = body.get("q", "")
+    return {
+        "organic": [
+            {
+                "title": f"Result {i} for {query}",
+                "snippet": f"Snippet {i} about {query}. " + " ".join(WORDS),
+                "link": f"https://example.com/{i}",
+            }
+            for i in range(10)
+        ]
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Serper endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=profile.ttft_median)
+    parser.add_argument("--ttft-sigma", type=float, default=profile.ttft_sigma)
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=profile.tokens_per_second
+    )
+    parser.add_argument(
+        "--completion-tokens", type=int, default=profile.completion_tokens
+    )
+    parser.add_argument(
+        "--embedding-latency", type=float, default=profile.embedding_latency
+    )
+    parser.add_argument("--search-latency", type=float, default=profile.search_latency)
+    parser.add_argument("--error-rate", type=float, default=profile.error_rate)
+    args = parser.parse_args()
+
+    profile.ttft_median = args.ttft
+    profile.ttft_sigma = args.ttft_sigma
+    profile.tokens_per_second = args.tokens_per_second
+    profile.completion_tokens = args.completion_tokens
+    profile.embedding_latency = args.embedding_latency
+    profile.search_latency = args.search_latency
+    profile.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
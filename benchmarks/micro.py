@@ -0,0 +1,320 @@
+"""Micro-benchmarks of the backend's per-request hot paths, with a regression gate.
+
+Covers the framework overhead each request pays in our own code, at realistic
+payload sizes:
+- the classifier;
+- the node logging wrappers;
+- prompt preparation and packing with histories of 10/100/1000 turns and
+  1-50 retrieved passages;
+- LangGraph state merging through a graph of no-op nodes;
+- Pydantic parsing of ``Message``.
+
+No network is involved. History summaries are answered instantly by a stub
+client, so the cached steady state of a long session is what gets measured.
+
+Usage:
+    python micro.py run [--output results.json] [-k prompt]
+    python micro.py run --output baselines/micro.json   # refresh the baseline
+    python micro.py compare baselines/micro.json results.json [--threshold 0.5]
+
+``compare`` exits with status 1 when any benchmark is more than ``threshold``
+slower than its baseline. It compares the fastest of the repeats, which is
+the least noisy estimate of a path's own cost (as with timeit); medians are
+recorded too. A fixed pure-Python loop is timed alongside every repeat, and
+each baseline is scaled by how much faster or slower that loop ran next to
+it, so a busier or slower host doesn't read as a regression (a path only
+regresses when it is slower both as measured and as scaled).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "services" / "backend"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import logging  # noqa: E402
+
+from langgraph.graph import END, StateGraph  # noqa: E402
+from app.core.context_packing import compactor, pack_prompt  # noqa: E402
+from app.core.graph import GraphState, log_state_wrapper  # noqa: E402
+from app.core.state import initial_state  # noqa: E402
+from app.core.nodes import classify_query, simple_responder  # noqa: E402
+from app.core.nodes.node_logging import log_node_calls  # noqa: E402
+from app.core.query_classifier import classifier  # noqa: E402
+from app.main import Message  # noqa: E402
+
+
+BASELINE = HERE / "baselines" / "micro.json"
+HISTORY_SIZES = (10, 100, 1000)
+CONTEXT_SIZES = (1, 10, 50)
+CALIBRATION_WORDS = [f"word{i % 97}" for i in range(1000)]
+
+QUERY = (
+    "Can you write a python script that reads the attached report and "
+    "summarizes the latest quarterly numbers for the team?"
+)
+TURN_TEXT = (
+    "Sure, here is a detailed explanation of how the retry logic works in the "
+    "client, including the backoff schedule, which errors are considered "
+    "transient, how deadlines are propagated and what happens when the "
+    "upstream keeps failing after the final attempt has been made. "
+)
+
+
+def history(turns: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i} {TURN_TEXT}"}
+        for i in range(turns)
+    ]
+
+
+def passages(n: int) -> list[dict]:
+    return [
+        {
+            "title": f"Quarterly report section {i}",
+            "snippet": f"Section {i} of the report. " + TURN_TEXT * 2,
+            "url": f"https://example.com/report/{i}",
+        }
+        for i in range(n)
+    ]
+
+
+class _SummaryClient:
+    """Answers history summary calls instantly with a fixed summary."""
+
+    def __init__(self):
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=TURN_TEXT))]
+        )
+
+        async def create(**kwargs):
+            return response
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+def noop_graph():
+    """The full workflow's shape with nodes that change nothing."""
+
+    async def node(state):
+        return {}
+
+    g = StateGraph(state_schema=GraphState)
+    for name in ("classifier", "retrieval", "text_gen"):
+        g.add_node(name, log_state_wrapper(name, node))
+    g.set_entry_point("classifier")
+    g.add_edge("classifier", "retrieval")
+    g.add_edge("retrieval", "text_gen")
+    g.add_edge("text_gen", END)
+    return g.compile()
+
+
+def benchmarks() -> dict[str, tuple[Callable[[], Any], bool]]:
+    """Name -> (zero-argument callable, whether it returns an awaitable)."""
+
+    @log_node_calls
+    def logged_noop(state):
+        return state
+
+    async def wrapped_target(state):
+        return state
+
+    wrapped_noop = log_state_wrapper("noop", wrapped_target)
+    small_state = {"query": QUERY, "history": history(10)}
+    graph = noop_graph()
+
+    cases: dict[str, tuple[Callable[[], Any], bool]] = {
+        "classify/keywords": (lambda: classifier.classify(QUERY), False),
+        "classify/node": (lambda: classify_query.classify({"query": QUERY}), False),
+        "wrapper/log_node_calls": (lambda: logged_noop(small_state), False),
+        "wrapper/log_state_wrapper": (lambda: wrapped_noop(small_state), True),
+    }
+    for turns in HISTORY_SIZES:
+        h = history(turns)
+        cases[f"prepare_messages/history_{turns}"] = (
+            lambda h=h: simple_responder.prepare_messages(QUERY, h),
+            True,
+        )
+        state = {**initial_state(QUERY, h), "context": tuple(passages(10))}
+        cases[f"graph/noop_state_history_{turns}"] = (
+            lambda state=state: graph.ainvoke(state),
+            True,
+        )
+        # Inline history is sent as plain strings
+        payload = json.dumps(
+            {"id": "bench", "content": QUERY, "history": [t["content"] for t in h]}
+        )
+        cases[f"message/parse_history_{turns}"] = (
+            lambda payload=payload: Message.model_validate_json(payload),
+            False,
+        )
+    for n in CONTEXT_SIZES:
+        context = passages(n)
+        cases[f"pack_prompt/context_{n}"] = (
+            lambda context=context: pack_prompt("text", QUERY, history(10), context),
+            True,
+        )
+    return cases
+
+
+async def _time(fn: Callable[[], Any], is_async: bool, number: int) -> float:
+    start = time.perf_counter()
+    if is_async:
+        for _ in range(number):
+            await fn()
+    else:
+        for _ in range(number):
+            fn()
+    return time.perf_counter() - start
+
+
+async def measure(
+    fn: Callable[[], Any | Awaitable[Any]],
+    is_async: bool,
+    repeat: int = 7,
+    min_seconds: float = 0.05,
+    calibration_number: int = 0,
+) -> dict:
+    """Time ``fn`` like timeit: calibrate the loop count, then repeat.
+
+    With ``calibration_number``, ``calibration_loop`` is timed before every
+    repeat, so both see the same load on the host.
+    """
+    await _time(fn, is_async, 1)  # warm caches (tokenizer, summaries, graph)
+    number = 1
+    while (elapsed := await _time(fn, is_async, number)) < min_seconds:
+        number *= 2 if elapsed * 10 > min_seconds else 10
+    per_call = []
+    calibration = []
+    for _ in range(repeat):
+        if calibration_number:
+            elapsed = await _time(calibration_loop, False, calibration_number)
+            calibration.append(elapsed / calibration_number)
+        per_call.append(await _time(fn, is_async, number) / number)
+    result = {
+        "median_us": statistics.median(per_call) * 1e6,
+        "min_us": min(per_call) * 1e6,
+        "number": number,
+    }
+    if calibration:
+        result["calibration_us"] = min(calibration) * 1e6
+    return result
+
+
+def silence_node_loggers() -> None:
+    """Keep the INFO records nodes log per call, but write them nowhere.
+
+    Formatting and emitting them is part of the per-request cost being
+    measured; printing them would drown the report.
+    """
+    devnull = open(os.devnull, "w")
+    for logger in logging.root.manager.loggerDict.values():
+        for handler in getattr(logger, "handlers", []):
+            if isinstance(handler, logging.StreamHandler):
+                handler.setStream(devnull)
+
+
+def calibration_loop() -> int:
+    """Interpreter-bound work of the same kind as the hot paths."""
+    counts: dict[str, int] = {}
+    for word in CALIBRATION_WORDS:
+        counts[word] = counts.get(word, 0) + len(word.casefold())
+    return sum(counts.values())
+
+
+async def run(pattern: str | None) -> dict:
+    compactor.client = _SummaryClient()
+    cases = benchmarks()
+    silence_node_loggers()
+    calibration = await measure(calibration_loop, False, min_seconds=0.01)
+    print(f"{'calibration':40} min {calibration['min_us']:10.1f} us")
+    results = {}
+    for name, (fn, is_async) in cases.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = await measure(
+            fn, is_async, calibration_number=calibration["number"]
+        )
+        print(
+            f"{name:40} min {results[name]['min_us']:10.1f} us"
+            f"  median {results[name]['median_us']:10.1f} us"
+        )
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "calibration_us": calibration["min_us"],
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Print the change per benchmark; return True when none regressed."""
+    ok = True
+    if baseline.get("calibration_us") and current.get("calibration_us"):
+        speed = baseline["calibration_us"] / current["calibration_us"] - 1
+        print(f"{'calibration':40} host speed {speed:+7.1%} vs baseline")
+    for name, base in sorted(baseline["results"].items()):
+        now = current["results"].get(name)
+        if now is None:
+            print(f"{name:40} missing")
+            continue
+        ratio = now["min_us"] / base["min_us"]
+        # Reports from before calibration was recorded compare unscaled. A
+        # lucky calibration repeat can overstate the host's speed, so the
+        # scaled ratio only ever excuses a slowdown.
+        if base.get("calibration_us") and now.get("calibration_us"):
+            scale = now["calibration_us"] / base["calibration_us"]
+            ratio = min(ratio, ratio / scale)
+        regressed = ratio > 1 + threshold
+        ok &= not regressed
+        print(
+            f"{name:40} {base['min_us']:10.1f} -> {now['min_us']:10.1f} us"
+            f"  {ratio - 1:+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    for name in sorted(set(current["results"]) - set(baseline["results"])):
+        print(f"{name:40} new (no baseline)")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend hot-path micro-benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--output", help="Write results JSON here")
+    run_parser.add_argument("-k", dest="pattern", help="Only names containing this")
+    compare_parser = commands.add_parser("compare", help="Gate on a baseline")
+    compare_parser.add_argument("baseline", nargs="?", default=str(BASELINE))
+    compare_parser.add_argument("results", nargs="?", help="Defaults to a fresh run")
+    compare_parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = asyncio.run(run(args.pattern))
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        return
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    if args.results:
+        current = json.loads(Path(args.results).read_text())
+    else:
+        current = asyncio.run(run(None))
+        print()
+    if not compare(baseline, current, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
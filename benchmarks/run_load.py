@@ -0,0 +1,229 @@
+"""End-to-end load test of the backend against local fake providers.
+
+Starts ``fake_providers.py`` and the MCP tool services pointed at it. For
+each workflow it then starts the backend (``uvicorn app.main:app``) with the
+OpenAI, Anthropic and Serper URLs redirected to the fakes and the response
+cache off, and replays a prompt corpus with the CLI client's load mode. It
+prints p50/p95/p99 latency, time to first token and requests per second per
+workflow, and can save them as JSON.
+
+The docs retriever needs Qdrant (``docker compose up vector_db``) at
+``VECTOR_DB_URL``. Without it, the FULL workflow runs without docs retrieval.
+
+Usage:
+    python run_load.py [--workflows simple full] [--concurrency 16] [--requests 200]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+SERVICES = ROOT / "services"
+HERE = Path(__file__).resolve().parent
+
+FAKE_PORT = 9100
+WEB_SEARCH_PORT = 9103
+DOCS_RETRIEVER_PORT = 9102
+BACKEND_PORT = 9000
+
+
+def start(args: list[str], cwd: Path, env: dict, log: Path) -> subprocess.Popen:
+    out = open(log, "w")
+    return subprocess.Popen(
+        args,
+        cwd=cwd,
+        env={**os.environ, **env},
+        stdout=out,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def wait_for(
+    url: str, proc: subprocess.Popen, timeout: float = 60.0, ok_only: bool = False
+) -> None:
+    """Wait until ``url`` answers (with a 2xx if ``ok_only``), or fail if ``proc`` died."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args} exited with {proc.returncode}")
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if not ok_only or response.is_success:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def qdrant_available(url: str) -> bool:
+    try:
+        return httpx.get(f"{url}/collections", timeout=2.0).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the backend on fakes.")
+    parser.add_argument(
+        "--workflows", nargs="+", default=["simple", "full"], choices=["simple", "full"]
+    )
+    parser.add_argument("--prompts", default=str(HERE / "prompts.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rps", type=float)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.4)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--backend-workers", type=int, default=1)
+    parser.add_argument("--output", help="Write all reports to this JSON file")
+    args = parser.parse_args()
+
+    logs = Path(tempfile.mkdtemp(prefix="llmflow-load-"))
+    fake_url = f"http://127.0.0.1:{FAKE_PORT}"
+    vector_db_url = os.environ.get("VECTOR_DB_URL", "http://localhost:6333")
+    procs = []
+    reports = {}
+    try:
+        fake = start(
+            [
+                sys.executable,
+                "fake_providers.py",
+                "--port",
+                str(FAKE_PORT),
+                "--ttft",
+                str(args.ttft),
+                "--tokens-per-second",
+                str(args.tokens_per_second),
+                "--completion-tokens",
+                str(args.completion_tokens),
+                "--error-rate",
+                str(args.error_rate),
+            ],
+            HERE,
+            {},
+            logs / "fake_providers.log",
+        )
+        procs.append(fake)
+        wait_for(f"{fake_url}/stats", fake)
+
+        if "full" in args.workflows:
+            search = start(
+                [sys.executable, "server.py"],
+                SERVICES / "web_search_tool",
+                {
+                    "PORT": str(WEB_SEARCH_PORT),
+                    "SERPER_URL": f"{fake_url}/search",
+                    "SERPER_API_KEY": "fake",
+                    # Every request should reach the fake, as uncached ones would
+                    "SEARCH_CACHE_TTL_SECONDS": "0",
+                },
+                logs / "web_search_tool.log",
+            )
+            procs.append(search)
+            wait_for(f"http://127.0.0.1:{WEB_SEARCH_PORT}/mcp", search)
+            if qdrant_available(vector_db_url):
+                docs = start(
+                    [sys.executable, "server.py"],
+                    SERVICES / "docs_retriever_tool",
+                    {
+                        "PORT": str(DOCS_RETRIEVER_PORT),
+                        "OPENAI_API_KEY": "sk-fake",
+                        "OPENAI_BASE_URL": f"{fake_url}/v1",
+                        "VECTOR_DB_URL": vector_db_url,
+                        "EMBEDDING_CACHE_DIR": "",
+                    },
+                    logs / "docs_retriever_tool.log",
+                )
+                procs.append(docs)
+                wait_for(f"http://127.0.0.1:{DOCS_RETRIEVER_PORT}/mcp", docs)
+            else:
+                print(f"Qdrant not reachable at {vector_db_url}; skipping docs retriever")
+
+        for workflow in args.workflows:
+            backend = start(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "app.main:app",
+                    "--port",
+                    str(BACKEND_PORT),
+                    "--workers",
+                    str(args.backend_workers),
+                    "--log-level",
+                    "warning",
+                ],
+                SERVICES / "backend",
+                {
+                    "ACTIVE_WORKFLOW": workflow,
+                    "OPENAI_API_KEY": "sk-fake",
+                    "OPENAI_BASE_URL": f"{fake_url}/v1",
+                    "ANTHROPIC_API_KEY": "fake",
+                    "ANTHROPIC_BASE_URL": f"{fake_url}/v1/",
+                    "WEB_SEARCH_TOOL_URL": f"http://127.0.0.1:{WEB_SEARCH_PORT}/mcp",
+                    "DOCS_RETRIEVER_TOOL_URL": (
+                        f"http://127.0.0.1:{DOCS_RETRIEVER_PORT}/mcp"
+                    ),
+                    "RESPONSE_CACHE_ENABLED": "false",
+                    "ARTIFACT_DIR": str(logs / "artifacts"),
+                    "LOG_LEVEL": "WARNING",
+                },
+                logs / f"backend_{workflow}.log",
+            )
+            try:
+                # Liveness comes first; wait for warm-up so it isn't measured
+                wait_for(
+                    f"http://127.0.0.1:{BACKEND_PORT}/health/ready",
+                    backend,
+                    ok_only=True,
+                )
+                report_path = logs / f"report_{workflow}.json"
+                print(f"\n== {workflow.upper()} workflow ==")
+                command = [
+                    sys.executable,
+                    "chat.py",
+                    "--url",
+                    f"http://127.0.0.1:{BACKEND_PORT}",
+                    "--load",
+                    args.prompts,
+                    "--concurrency",
+                    str(args.concurrency),
+                    "--requests",
+                    str(args.requests),
+                    "--json",
+                    str(report_path),
+                ]
+                if args.rps:
+                    command += ["--rps", str(args.rps)]
+                subprocess.run(command, cwd=SERVICES / "cli_chat_client", check=True)
+                reports[workflow] = json.loads(report_path.read_text())
+            finally:
+                stop(backend)
+    finally:
+        for proc in reversed(procs):
+            stop(proc)
+
+    print(f"\nService logs: {logs}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
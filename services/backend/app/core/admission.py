@@ -0,0 +1,174 @@
+"""Admission control in front of workflow execution.
+
+Each model gets a fixed number of execution slots. Requests beyond that wait
+in a bounded priority queue (interactive before batch, then by deadline);
+when the queue for their class is full they are rejected immediately, and
+queued requests whose deadline passes are dropped instead of being run late.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from . import config
+from .metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; ``reason`` is queue_full or deadline."""
+
+    def __init__(self, model: str, reason: str, retry_after: int):
+        super().__init__(f"{model} is overloaded ({reason}), retry in {retry_after}s")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    deadline: float
+    seq: int
+    future: asyncio.Future = field(compare=False)
+
+
+class ModelGate:
+    """Slots and wait queue for a single model."""
+
+    def __init__(self, model: str, limit: int, queue_limits: dict[int, int]):
+        self.model = model
+        self.limit = limit
+        self.queue_limits = queue_limits
+        self.in_flight = 0
+        self.queued = {priority: 0 for priority in queue_limits}
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        # Moving average of how long a request holds a slot, for Retry-After
+        self.service_seconds = 1.0
+
+    def retry_after(self) -> int:
+        waiting = sum(self.queued.values()) + 1
+        return max(1, math.ceil(self.service_seconds * waiting / self.limit))
+
+    def check(self, priority: int) -> None:
+        """Fail fast if a request of this priority could not even be queued."""
+        if self.in_flight < self.limit and not self._heap:
+            return
+        if self.queued[priority] >= self.queue_limits[priority]:
+            ADMISSION_REJECTED.inc(self.model, "queue_full")
+            raise Overloaded(self.model, "queue_full", self.retry_after())
+
+    def try_acquire(self) -> bool:
+        """Take a free slot without queueing; False when there is none."""
+        if self.in_flight < self.limit and not self._heap:
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self, priority: int, deadline: float) -> None:
+        if self.in_flight < self.limit and not self._heap:
+            self.in_flight += 1
+            return
+        self.check(priority)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._heap, _Waiter(priority, deadline, next(self._seq), future)
+        )
+        self.queued[priority] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTED.inc(self.model, "deadline")
+            raise Overloaded(self.model, "deadline", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the caller went away
+            if future.done() and not future.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            self.queued[priority] -= 1
+
+    def release(self, held_seconds: float) -> None:
+        if held_seconds:
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the most urgent live waiters."""
+        now = time.monotonic()
+        while self.in_flight < self.limit and self._heap:
+            waiter = heapq.heappop(self._heap)
+            # Abandoned or expired waiters are skipped; their own wait fails
+            if waiter.future.done() or waiter.deadline <= now:
+                continue
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued_interactive": self.queued[INTERACTIVE],
+            "queued_batch": self.queued[BATCH],
+            "service_seconds": self.service_seconds,
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        limits: dict[str, int],
+        default_limit: int = 32,
+        max_queue: int = 64,
+        max_batch_queue: int = 256,
+    ):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.queue_limits = {INTERACTIVE: max_queue, BATCH: max_batch_queue}
+        self.gates: dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self.gates.get(model)
+        if gate is None:
+            limit = self.limits.get(model, self.default_limit)
+            gate = ModelGate(model, limit, self.queue_limits)
+            self.gates[model] = gate
+        return gate
+
+    def check(self, model: str, priority: int = INTERACTIVE) -> None:
+        self.gate(model).check(priority)
+
+    @asynccontextmanager
+    async def admit(self, model: str, priority: int, deadline: float):
+        """Hold one of ``model``'s slots for the duration of the block."""
+        gate = self.gate(model)
+        start = time.monotonic()
+        await gate.acquire(priority, deadline)
+        admitted = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(
+            admitted - start, model, PRIORITY_NAMES[priority]
+        )
+        try:
+            yield
+        finally:
+            gate.release(time.monotonic() - admitted)
+
+    def stats(self) -> dict:
+        return {model: gate.stats() for model, gate in self.gates.items()}
+
+
+controller = AdmissionController(
+    config.ADMISSION_MODEL_LIMITS,
+    default_limit=config.ADMISSION_DEFAULT_LIMIT,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    max_batch_queue=config.ADMISSION_MAX_BATCH_QUEUE,
+)
@@ -0,0 +1,307 @@
+"""Generated files, streamed to disk off the event loop and readable while written.
+
+A generator node opens an :class:`ArtifactWriter` and feeds it completion
+deltas. A background task appends whatever has accumulated to
+``<name>.part`` in a worker thread, so the loop only ever appends to a list.
+On close the file is renamed to ``<name>``, or gzipped to ``<name>.gz`` with
+``ARTIFACT_COMPRESSION=gzip``. :func:`open_reader` follows a ``.part`` file
+until its writer finishes, so a download can start with the first tokens.
+"""
+
+import asyncio
+import gzip
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+from . import config
+from .metrics import ARTIFACTS_EVICTED
+from .nodes.node_logging import get_node_logger
+from .streaming import emit
+
+logger = get_node_logger(__name__)
+
+PARTIAL_SUFFIX = ".part"
+COMPRESSED_SUFFIX = ".gz"
+CHUNK_BYTES = 64 * 1024
+# How often a reader re-checks a file written by another worker process
+FOLLOW_POLL_SECONDS = 0.25
+_NAME = re.compile(r"[0-9a-f-]{36}\.[a-z0-9]+")
+
+# Artifacts being written by this process, by name
+_active: dict[str, "ArtifactWriter"] = {}
+
+
+class ArtifactWriter:
+    def __init__(self, directory: Path, name: str, compression: str):
+        self.directory = directory
+        self.name = name
+        self.compression = compression
+        self.partial = directory / (name + PARTIAL_SUFFIX)
+        self.finished = False
+        # Replaced after every flush, so readers wait on the one they saw
+        self.changed = asyncio.Event()
+        self._pending: list[str] = []
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._drain())
+
+    @property
+    def path(self) -> Path:
+        """Where the finished artifact ends up."""
+        suffix = COMPRESSED_SUFFIX if self.compression == "gzip" else ""
+        return self.directory / (self.name + suffix)
+
+    def write(self, text: str) -> None:
+        """Queue ``text`` to be appended; never blocks."""
+        self._pending.append(text)
+        self._wakeup.set()
+
+    def _notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def _drain(self) -> None:
+        f = await asyncio.to_thread(_open_partial, self.partial)
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if self._pending:
+                    data = "".join(self._pending).encode()
+                    self._pending.clear()
+                    await asyncio.to_thread(_append, f, data)
+                    self._notify()
+                if self._closing and not self._pending:
+                    return
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def close(self) -> Path:
+        """Flush what is queued and move the file to its final name."""
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._task
+            await asyncio.to_thread(
+                _finalize, self.partial, self.path, self.compression
+            )
+        finally:
+            self._done()
+        return self.path
+
+    async def abort(self) -> None:
+        """Stop writing and remove the partial file."""
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, OSError):
+            pass
+        await asyncio.to_thread(self.partial.unlink, missing_ok=True)
+        self._done()
+
+    def _done(self) -> None:
+        self.finished = True
+        self._notify()
+        _active.pop(self.name, None)
+
+
+def _open_partial(path: Path) -> BinaryIO:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return open(path, "ab")
+
+
+def _append(f: BinaryIO, data: bytes) -> None:
+    f.write(data)
+    # Make the bytes visible to readers following the file
+    f.flush()
+
+
+def _finalize(partial: Path, final: Path, compression: str) -> None:
+    if compression != "gzip":
+        os.replace(partial, final)
+        return
+    tmp = final.with_name(final.name + ".tmp")
+    with open(partial, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, final)
+    # Readers still following the .part file keep their open handle
+    partial.unlink()
+
+
+def open_artifact(node: str, ext: str) -> ArtifactWriter:
+    """Start a new artifact and announce its download URL on the graph stream."""
+    name = f"{uuid.uuid4()}{ext}"
+    writer = ArtifactWriter(Path(config.ARTIFACT_DIR), name, config.ARTIFACT_COMPRESSION)
+    _active[name] = writer
+    emit({"type": "artifact", "node": node, "name": name, "url": url_for(name)})
+    return writer
+
+
+def url_for(path: str) -> str:
+    """Download URL of an artifact, given its name or file path."""
+    return f"/artifacts/{Path(path).name.removesuffix(COMPRESSED_SUFFIX)}"
+
+
+def _open_first(directory: Path, name: str, accept_gzip: bool):
+    """Open the partial, plain or compressed file, whichever exists, in that order.
+
+    A writer only removes the partial file once the final one is in place,
+    so trying them in this order cannot miss a finishing artifact.
+    """
+    for path, kind in (
+        (directory / (name + PARTIAL_SUFFIX), "partial"),
+        (directory / name, "plain"),
+        (directory / (name + COMPRESSED_SUFFIX), "gzip"),
+    ):
+        try:
+            if kind == "gzip" and not accept_gzip:
+                return gzip.open(path, "rb"), path, "plain"
+            return open(path, "rb"), path, kind
+        except FileNotFoundError:
+            continue
+    return None
+
+
+async def open_reader(
+    name: str, accept_gzip: bool = False
+) -> Optional[tuple[AsyncIterator[bytes], dict]]:
+    """Return the artifact's byte chunks and response headers, or None if unknown.
+
+    A compressed artifact is sent as-is with ``Content-Encoding: gzip`` when
+    the client accepts it and decompressed on the fly otherwise.
+    """
+    if not _NAME.fullmatch(name):
+        return None
+    directory = Path(config.ARTIFACT_DIR)
+    opened = await asyncio.to_thread(_open_first, directory, name, accept_gzip)
+    if opened is None:
+        return None
+    f, path, kind = opened
+    if kind == "partial":
+        return _follow(f, path, _active.get(name)), {"Cache-Control": "no-cache"}
+    headers = {"Content-Encoding": "gzip"} if kind == "gzip" else {}
+    return _read_all(f), headers
+
+
+async def _read_all(f: BinaryIO) -> AsyncIterator[bytes]:
+    try:
+        while chunk := await asyncio.to_thread(f.read, CHUNK_BYTES):
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def _follow(
+    f: BinaryIO, partial: Path, writer: Optional[ArtifactWriter]
+) -> AsyncIterator[bytes]:
+    """Yield the file's bytes as they are appended until the writer finishes.
+
+    Writers in this process wake the reader after each flush; files written
+    by another worker are polled until their ``.part`` file is renamed. A
+    file that stops growing for longer than an LLM call may last was
+    abandoned by a crashed writer and ends the download.
+    """
+    idle_since = time.monotonic()
+    try:
+        while True:
+            # Checked before reading so that bytes flushed in between are
+            # still picked up by this read
+            if writer is not None:
+                changed, finished = writer.changed, writer.finished
+            else:
+                changed = None
+                finished = not await asyncio.to_thread(partial.exists)
+            chunk = await asyncio.to_thread(f.read, CHUNK_BYTES)
+            if chunk:
+                idle_since = time.monotonic()
+                yield chunk
+                continue
+            if finished:
+                return
+            if time.monotonic() - idle_since > config.LLM_CALL_TIMEOUT_SECONDS:
+                logger.warning(f"Artifact {partial.name} stopped growing")
+                return
+            if changed is not None:
+                try:
+                    await asyncio.wait_for(changed.wait(), FOLLOW_POLL_SECONDS * 4)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(FOLLOW_POLL_SECONDS)
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def sweep(
+    directory: Path,
+    retention_seconds: float,
+    max_bytes: int,
+    active: set[str],
+    now: Optional[float] = None,
+) -> dict[str, int]:
+    """Delete expired artifacts, then the oldest ones until under ``max_bytes``.
+
+    Partial files not being written by this process are removed once they
+    have not grown for longer than an LLM call may last.
+    """
+    now = time.time() if now is None else now
+    removed = {"expired": 0, "size": 0, "stale": 0}
+    kept = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        try:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            age = now - stat.st_mtime
+            if entry.name.endswith(PARTIAL_SUFFIX):
+                name = entry.name.removesuffix(PARTIAL_SUFFIX)
+                if name not in active and age > config.LLM_CALL_TIMEOUT_SECONDS:
+                    os.unlink(entry.path)
+                    removed["stale"] += 1
+                continue
+            if age > retention_seconds:
+                os.unlink(entry.path)
+                removed["expired"] += 1
+                continue
+        except FileNotFoundError:
+            continue
+        kept.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in kept)
+    for _, size, path in sorted(kept):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed["size"] += 1
+    return removed
+
+
+async def retention_loop() -> None:
+    """Sweep the artifact directory every ``ARTIFACT_SWEEP_INTERVAL_SECONDS``."""
+    directory = Path(config.ARTIFACT_DIR)
+    while True:
+        try:
+            removed = await asyncio.to_thread(
+                sweep,
+                directory,
+                config.ARTIFACT_RETENTION_SECONDS,
+                config.ARTIFACT_MAX_BYTES,
+                set(_active),
+            )
+            for reason, count in removed.items():
+                if count:
+                    ARTIFACTS_EVICTED.inc(reason, amount=count)
+        except Exception as e:
+            logger.error(f"Artifact sweep failed: {str(e)}")
+        await asyncio.sleep(config.ARTIFACT_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,178 @@
+"""Exact-match response cache placed in front of workflow execution."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional
+from .nodes.node_logging import get_node_logger
+
+logger = get_node_logger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key."""
+    return " ".join(text.split()).casefold()
+
+
+def normalize_turn(turn: Any) -> Any:
+    """Normalize a history entry: a bare user string or a role-tagged turn."""
+    if isinstance(turn, str):
+        return normalize_text(turn)
+    return [turn["role"], normalize_text(turn["content"])]
+
+
+def make_cache_key(
+    query: str, history: List[Any], workflow: str, model_config: dict
+) -> str:
+    """Build a stable key from the normalized request and model settings."""
+    payload = json.dumps(
+        [
+            normalize_text(query),
+            [normalize_turn(h) for h in history],
+            workflow,
+            model_config,
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Bounded in-process LRU with a per-entry expiry time."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SQLiteCacheBackend:
+    """Shared cache tier for multi-worker deployments.
+
+    A local SQLite file stands in for a network cache such as Redis; every
+    worker pointed at the same path sees the same entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _get(self, key: str) -> Optional[tuple[Any, float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            conn.execute(
+                "DELETE FROM response_cache WHERE expires_at < ?", (time.time(),)
+            )
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        """Return ``(value, expires_at)`` or ``None`` without blocking the loop."""
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+
+class ResponseCache:
+    """Two-tier response cache: in-process LRU backed by an optional shared store."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        backend: Optional[SQLiteCacheBackend] = None,
+    ):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.backend is not None:
+            try:
+                found = await self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Shared response cache lookup failed: {str(e)}")
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.memory.set(key, value, ttl=expires_at - time.time())
+                self.hits += 1
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared response cache write failed: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,255 @@
+"""Per-node checkpoints of workflow runs so a retried request resumes.
+
+Runs are keyed by the request's ``Message.id``. Each node's state update is
+stored as soon as the node finishes, and the client payload once the run
+completes. When a client retries a request with the same id:
+- a completed run's payload is returned as is, without running anything;
+- otherwise nodes that already finished return their stored update instead
+  of running again. A run that failed in ``text_gen`` after ``retrieval``
+  succeeded only repeats the generation; if a retrieval tool had failed,
+  the retry fetches the context again.
+
+A request that reuses an id with a different body starts a new run.
+"""
+
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+from . import config
+from .metrics import CHECKPOINT_NODES_RESUMED, CHECKPOINT_RUNS
+from .nodes.node_logging import get_node_logger
+
+logger = get_node_logger(__name__)
+
+# The run the current request is executing; graph nodes inherit it
+current_run: contextvars.ContextVar[Optional["RunCheckpoint"]] = (
+    contextvars.ContextVar("current_run", default=None)
+)
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash of the request body a run was started for."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunCheckpoint:
+    """What one run has completed so far, and where to record the rest.
+
+    Store failures are logged and otherwise ignored: they cost the ability
+    to resume, never the request.
+    """
+
+    def __init__(
+        self,
+        store: "CheckpointStore",
+        run_id: str,
+        updates: dict[str, dict],
+        result: Optional[dict] = None,
+    ):
+        self.store = store
+        self.run_id = run_id
+        self.updates = updates
+        self.result = result
+
+    async def save(self, node: str, update: dict) -> None:
+        self.updates[node] = update
+        try:
+            await self.store.save_node(self.run_id, node, update)
+        except Exception as e:
+            logger.warning(
+                f"Checkpoint of {node} in run {self.run_id} failed: {str(e)}"
+            )
+
+    async def finish(self, payload: dict) -> None:
+        self.result = payload
+        try:
+            await self.store.finish(self.run_id, payload)
+        except Exception as e:
+            logger.warning(
+                f"Storing the result of run {self.run_id} failed: {str(e)}"
+            )
+
+
+def checkpointed(node: str, func: Callable) -> Callable:
+    """Replay ``node``'s stored update if the current run already finished it.
+
+    Otherwise run it and store its update. Updates that report an error, or
+    retrieval that is missing a failed tool's context, are not stored, so a
+    retry runs the node again.
+    """
+
+    @functools.wraps(func)
+    async def wrapped(state: dict[str, Any]) -> dict[str, Any]:
+        run = current_run.get()
+        if run is None:
+            return await func(state)
+        if node in run.updates:
+            logger.info(f"Resuming run {run.run_id}: {node} already completed")
+            CHECKPOINT_NODES_RESUMED.inc(node)
+            return run.updates[node]
+        update = await func(state)
+        if (
+            isinstance(update, dict)
+            and not update.get("error")
+            and not update.get("tool_errors")
+        ):
+            await run.save(node, update)
+        return update
+
+    return wrapped
+
+
+class CheckpointStore:
+    """Run checkpoints in a local SQLite file.
+
+    Stands in for a network store such as Redis; every worker pointed at the
+    same path can resume runs started by the others. Runs expire
+    ``ttl`` seconds after their last write. A completed run is compacted to
+    its payload, since its node updates will never be replayed.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Lets the sweep return freed pages to the file system. It must be
+        # set before WAL mode is, and only takes effect on a new file.
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.close()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "result TEXT, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS run_nodes ("
+                "run_id TEXT NOT NULL, node TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (run_id, node))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_by_age ON runs (updated_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _open(
+        self, run_id: str, fingerprint: str
+    ) -> tuple[dict[str, dict], Optional[dict]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, result, updated_at FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+            if row and row[0] == fingerprint and row[2] >= now - self.ttl:
+                if row[1] is not None:
+                    return {}, json.loads(row[1])
+                rows = conn.execute(
+                    "SELECT node, value FROM run_nodes WHERE run_id = ?", (run_id,)
+                ).fetchall()
+                # A retry keeps the run alive for another ttl
+                conn.execute(
+                    "UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id)
+                )
+                return {node: json.loads(value) for node, value in rows}, None
+            # A new run, or one that expired or whose id was reused
+            conn.execute("DELETE FROM run_nodes WHERE run_id = ?", (run_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, NULL, ?)",
+                (run_id, fingerprint, now),
+            )
+        return {}, None
+
+    def _save_node(self, run_id: str, node: str, update: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO run_nodes VALUES (?, ?, ?)",
+                (run_id, node, json.dumps(update, default=str)),
+            )
+            conn.execute(
+                "UPDATE runs SET updated_at = ? WHERE run_id = ?",
+                (time.time(), run_id),
+            )
+
+    def _finish(self, run_id: str, payload: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET result = ?, updated_at = ? WHERE run_id = ?",
+                (json.dumps(payload, default=str), time.time(), run_id),
+            )
+            conn.execute("DELETE FROM run_nodes WHERE run_id = ?", (run_id,))
+
+    def _sweep(self) -> int:
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM runs WHERE updated_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            conn.execute(
+                "DELETE FROM run_nodes WHERE run_id NOT IN (SELECT run_id FROM runs)"
+            )
+        if removed:
+            with self._connect() as conn:
+                conn.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    def _stats(self) -> dict:
+        with self._connect() as conn:
+            runs, completed = conn.execute(
+                "SELECT COUNT(*), COUNT(result) FROM runs"
+            ).fetchone()
+            nodes = conn.execute("SELECT COUNT(*) FROM run_nodes").fetchone()[0]
+        return {"runs": runs, "completed": completed, "node_checkpoints": nodes}
+
+    async def open(self, run_id: str, fingerprint: str) -> Optional[RunCheckpoint]:
+        """Start or resume the run ``run_id``.
+
+        Returns None when the store can't be read, in which case the request
+        runs without checkpoints.
+        """
+        try:
+            updates, result = await asyncio.to_thread(self._open, run_id, fingerprint)
+        except Exception as e:
+            logger.warning(f"Opening checkpoints for run {run_id} failed: {str(e)}")
+            return None
+        if result is not None:
+            CHECKPOINT_RUNS.inc("completed")
+        else:
+            CHECKPOINT_RUNS.inc("resumed" if updates else "new")
+        return RunCheckpoint(self, run_id, updates, result)
+
+    async def save_node(self, run_id: str, node: str, update: dict) -> None:
+        await asyncio.to_thread(self._save_node, run_id, node, update)
+
+    async def finish(self, run_id: str, payload: dict) -> None:
+        await asyncio.to_thread(self._finish, run_id, payload)
+
+    async def sweep(self) -> int:
+        """Delete expired runs; return how many."""
+        return await asyncio.to_thread(self._sweep)
+
+    async def stats(self) -> dict:
+        return await asyncio.to_thread(self._stats)
+
+
+async def sweep_loop(store: CheckpointStore) -> None:
+    """Expire runs every ``CHECKPOINT_SWEEP_INTERVAL_SECONDS``."""
+    while True:
+        try:
+            removed = await store.sweep()
+            if removed:
+                CHECKPOINT_RUNS.inc("expired", amount=removed)
+        except Exception as e:
+            logger.error(f"Checkpoint sweep failed: {str(e)}")
+        await asyncio.sleep(config.CHECKPOINT_SWEEP_INTERVAL_SECONDS)
@@ -1,12 +1,14 @@
 """Common configuration and client setup for LLM Flow."""
 
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from .nodes.node_logging import get_node_logger
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 logger = get_node_logger(__name__)
 
 # System prompts
@@ -25,7 +27,7 @@ def load_environment() -> None:
         logger.warning(f"No .env file found at {workspace_env}")
 
 
-def get_openai_client() -> Optional[AsyncOpenAI]:
+def get_openai_client() -> Optional["AsyncOpenAI"]:
     """Initialize OpenAI client with proper error handling."""
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
@@ -34,7 +36,27 @@ def get_openai_client() -> Optional[AsyncOpenAI]:
     if not api_key.startswith("sk-"):
         logger.error("OPENAI_API_KEY appears to be invalid (should start with 'sk-')")
         return None
-    return AsyncOpenAI(api_key=api_key)
+    # The SDK is imported on first use to keep it off the import path
+    from openai import AsyncOpenAI
+
+    # Retries are handled by streaming.stream_completion, which knows whether
+    # tokens have already been forwarded; don't stack the SDK's on top
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+
+def get_anthropic_client() -> Optional["AsyncOpenAI"]:
+    """Client for Anthropic models through its OpenAI-compatible endpoint."""
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        logger.info("ANTHROPIC_API_KEY not set; Anthropic models are unavailable")
+        return None
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1/"),
+        max_retries=0,
+    )
 
 
 # Default LLM configuration
@@ -42,22 +64,58 @@ DEFAULT_MODEL = "gpt-4"
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 2000
 
-# Task-specific configurations
+# Task-specific configurations. ``prompt_budget`` caps the tokens sent per
+# call (system prompt, history and retrieved context together).
 MODEL_CONFIG = {
     "chat": {
         "model": "gpt-4",
         "temperature": 0.7,
         "max_tokens": 2000,
+        "prompt_budget": 6000,  # 8k window minus max_tokens
+        "fallback_model": "gpt-4o-mini",
+        # Models the router may pick instead, and the p95 it must stay under
+        "candidates": ["gpt-4", "gpt-4.1", "gpt-4o-mini"],
+        "latency_slo_seconds": 10,
     },
     "code": {
         "model": "claude-3-opus-20240229",  # Better at code generation
         "temperature": 0.2,  # Lower temperature for more precise code
         "max_tokens": 4000,  # Longer context for code
+        "prompt_budget": 12000,
+        "fallback_model": "gpt-4o-mini",
+        "candidates": ["claude-3-opus-20240229", "gpt-4.1"],
+        "latency_slo_seconds": 60,
     },
     "text": {
         "model": "gpt-4.1",  # Using GPT-4.1 for enhanced text generation
         "temperature": 0.7,
         "max_tokens": 3000,
+        "prompt_budget": 12000,
+        "fallback_model": "gpt-4o-mini",
+        "candidates": ["gpt-4.1", "gpt-4", "gpt-4o-mini"],
+        "latency_slo_seconds": 45,
+    },
+    "summary": {
+        "model": "gpt-4o-mini",  # Cheap model for compacting old history
+        "temperature": 0.0,
+        "max_tokens": 300,
+        "prompt_budget": 4000,
+    },
+}
+
+# Provider and USD list price per 1k input / output tokens of routable models
+MODEL_CATALOG = {
+    "gpt-4": {"provider": "openai", "input_cost": 0.03, "output_cost": 0.06},
+    "gpt-4.1": {"provider": "openai", "input_cost": 0.002, "output_cost": 0.008},
+    "gpt-4o-mini": {
+        "provider": "openai",
+        "input_cost": 0.00015,
+        "output_cost": 0.0006,
+    },
+    "claude-3-opus-20240229": {
+        "provider": "anthropic",
+        "input_cost": 0.015,
+        "output_cost": 0.075,
     },
 }
 
@@ -70,6 +128,8 @@ Follow best practices and include appropriate error handling.
 Ensure the code is well-documented and follows language-specific conventions.""",
     "text": """You are a professional writer. Generate clear and well-structured text content.
 Focus on readability and proper organization. Maintain consistent tone and style.""",
+    "summary": """Summarize the conversation so far for use as context in later turns.
+Keep facts, decisions, names and open questions; drop pleasantries. Be brief.""",
 }
 
 
@@ -83,6 +143,198 @@ def get_system_prompt(task: str = "chat"):
     return SYSTEM_PROMPTS.get(task, SYSTEM_PROMPTS["chat"])
 
 
-# Initialize OpenAI client
 load_environment()
-openai_client = get_openai_client()
+
+# Provider clients are created on first use (or by warm_clients during a
+# worker's warm-up), so importing config never loads an SDK or TLS context
+CLIENT_FACTORIES = {"openai": get_openai_client, "anthropic": get_anthropic_client}
+_provider_clients: dict[str, Optional["AsyncOpenAI"]] = {}
+
+
+def get_provider_client(provider: str) -> Optional["AsyncOpenAI"]:
+    if provider not in _provider_clients:
+        factory = CLIENT_FACTORIES.get(provider)
+        _provider_clients[provider] = factory() if factory else None
+    return _provider_clients[provider]
+
+
+def warm_clients() -> None:
+    """Create every provider's client up front."""
+    for provider in CLIENT_FACTORIES:
+        get_provider_client(provider)
+
+
+def __getattr__(name: str):
+    # Lazily created module attributes kept for existing callers
+    if name == "openai_client":
+        return get_provider_client("openai")
+    if name == "PROVIDER_CLIENTS":
+        return {p: get_provider_client(p) for p in CLIENT_FACTORIES}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_provider(model: str) -> str:
+    """Return the provider serving ``model``, guessing from its name if unlisted."""
+    entry = MODEL_CATALOG.get(model)
+    if entry is not None:
+        return entry["provider"]
+    return "anthropic" if model.lower().startswith("claude") else "openai"
+
+
+def get_client(model: str) -> Optional["AsyncOpenAI"]:
+    """Return the client for the provider that serves ``model``."""
+    return get_provider_client(get_provider(model))
+
+
+# Response cache configuration (read after the .env file has been loaded)
+RESPONSE_CACHE_ENABLED = (
+    os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(
+    os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "3600")
+)
+# Set to a file path to share cached responses between worker processes
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")
+
+# Semantic (embedding similarity) response cache, disabled by default
+SEMANTIC_CACHE_ENABLED = (
+    os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+)
+SEMANTIC_CACHE_MODEL = os.environ.get("SEMANTIC_CACHE_MODEL", "text-embedding-3-small")
+SEMANTIC_CACHE_DIM = int(os.environ.get("SEMANTIC_CACHE_DIM", "256"))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", "100000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(
+    os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "3600")
+)
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+# Per-tool timeouts for the concurrent retrieval stage
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.environ.get("WEB_SEARCH_TIMEOUT_SECONDS", "8"))
+DOCS_RAG_TIMEOUT_SECONDS = float(os.environ.get("DOCS_RAG_TIMEOUT_SECONDS", "8"))
+
+# MCP tool services and the pooled client sessions kept open to them
+WEB_SEARCH_TOOL_URL = os.environ.get(
+    "WEB_SEARCH_TOOL_URL", "http://web_search_tool:7003/mcp"
+)
+DOCS_RETRIEVER_TOOL_URL = os.environ.get(
+    "DOCS_RETRIEVER_TOOL_URL", "http://docs_retriever_tool:7002/mcp"
+)
+TOOL_POOL_SIZE = int(os.environ.get("TOOL_POOL_SIZE", "2"))
+TOOL_MAX_IN_FLIGHT = int(os.environ.get("TOOL_MAX_IN_FLIGHT", "16"))
+TOOL_CALL_TIMEOUT_SECONDS = float(os.environ.get("TOOL_CALL_TIMEOUT_SECONDS", "30"))
+TOOL_HEALTH_CHECK_INTERVAL_SECONDS = float(
+    os.environ.get("TOOL_HEALTH_CHECK_INTERVAL_SECONDS", "30")
+)
+
+# Server-side conversation sessions; clients send only the newest message
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_TURNS = int(os.environ.get("SESSION_MAX_TURNS", "200"))
+# Set to a file path to share sessions between worker processes
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH")
+
+# Batch endpoint concurrency, and provider request rate limits as
+# "provider=requests_per_second" pairs, e.g. "openai=50,anthropic=20"
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "10000"))
+PROVIDER_RATE_LIMITS = {
+    provider.strip(): float(rate)
+    for provider, rate in (
+        pair.split("=", 1)
+        for pair in os.environ.get("PROVIDER_RATE_LIMITS", "").split(",")
+        if "=" in pair
+    )
+}
+
+# Admission control: concurrent workflow runs per model ("model=slots" pairs
+# override the default), queue bounds per priority and queueing deadlines
+ADMISSION_DEFAULT_LIMIT = int(os.environ.get("ADMISSION_DEFAULT_LIMIT", "32"))
+ADMISSION_MODEL_LIMITS = {
+    model.strip(): int(limit)
+    for model, limit in (
+        pair.split("=", 1)
+        for pair in os.environ.get("ADMISSION_MODEL_LIMITS", "").split(",")
+        if "=" in pair
+    )
+}
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_BATCH_QUEUE = int(os.environ.get("ADMISSION_MAX_BATCH_QUEUE", "256"))
+ADMISSION_DEADLINE_SECONDS = float(os.environ.get("ADMISSION_DEADLINE_SECONDS", "30"))
+BATCH_DEADLINE_SECONDS = float(os.environ.get("BATCH_DEADLINE_SECONDS", "600"))
+
+# Per-call LLM deadline, retry backoff and optional hedging after the
+# model's time-to-first-token quantile
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", "120"))
+LLM_FIRST_TOKEN_TIMEOUT_SECONDS = float(
+    os.environ.get("LLM_FIRST_TOKEN_TIMEOUT_SECONDS", "20")
+)
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.environ.get("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(
+    os.environ.get("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5")
+)
+
+# Model routing: "fixed" always uses MODEL_CONFIG's model; "slo" picks the
+# cheapest candidate whose rolling p95 meets the task's latency SLO; "fastest"
+# picks the lowest time to first token; "auto" is "slo" except that short
+# chat queries go to the fastest model
+ROUTER_POLICY = os.environ.get("ROUTER_POLICY", "fixed")
+ROUTER_EXPLORE_RATE = float(os.environ.get("ROUTER_EXPLORE_RATE", "0.05"))
+ROUTER_MAX_ERROR_RATE = float(os.environ.get("ROUTER_MAX_ERROR_RATE", "0.1"))
+ROUTER_SHORT_QUERY_WORDS = int(os.environ.get("ROUTER_SHORT_QUERY_WORDS", "20"))
+
+# Start the simple responder in the full workflow before classification has
+# finished; the answer is kept if the query turns out to be simple
+SPECULATIVE_RESPONDER = (
+    os.environ.get("SPECULATIVE_RESPONDER", "false").lower() == "true"
+)
+
+# Context packing: share of the prompt budget history may use when retrieved
+# context is present, and how many old turns are folded into a summary at once
+HISTORY_BUDGET_SHARE = float(os.environ.get("HISTORY_BUDGET_SHARE", "0.5"))
+SUMMARY_BLOCK_TURNS = int(os.environ.get("SUMMARY_BLOCK_TURNS", "8"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", "4096"))
+
+# Query classifier keyword sets, matched as lowercase substrings: "complex"
+# marks a query as not simple, the others set needs_web_search, needs_doc and
+# wants_code. A JSON object at CLASSIFIER_KEYWORDS_PATH replaces sets by name.
+CLASSIFIER_KEYWORDS = {
+    "complex": ["generate", "create", "write", "code", "document", "pdf"],
+    "web_search": ["latest", "current", "today"],
+    "doc": ["attached", "document"],
+    "code": [".cpp", ".py", ".java", ".ts", "c++", "python", "typescript", "java"],
+}
+CLASSIFIER_KEYWORDS_PATH = os.environ.get("CLASSIFIER_KEYWORDS_PATH")
+CLASSIFIER_SIMPLE_MAX_WORDS = int(os.environ.get("CLASSIFIER_SIMPLE_MAX_WORDS", "20"))
+# Optional hashed n-gram model (see query_classifier.py); its route decisions
+# override the keywords when its probability is at least the threshold
+# either way
+CLASSIFIER_MODEL_PATH = os.environ.get("CLASSIFIER_MODEL_PATH")
+CLASSIFIER_MODEL_THRESHOLD = float(os.environ.get("CLASSIFIER_MODEL_THRESHOLD", "0.8"))
+
+# Generated code/text artifacts: where they are written, whether finished
+# files are gzipped ("gzip" or "none"), and how long / how much is kept
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "/mnt/data")
+ARTIFACT_COMPRESSION = os.environ.get("ARTIFACT_COMPRESSION", "none").lower()
+ARTIFACT_RETENTION_SECONDS = float(
+    os.environ.get("ARTIFACT_RETENTION_SECONDS", str(7 * 24 * 3600))
+)
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", str(1 << 30)))
+ARTIFACT_SWEEP_INTERVAL_SECONDS = float(
+    os.environ.get("ARTIFACT_SWEEP_INTERVAL_SECONDS", "300")
+)
+
+# Per-node checkpoints of workflow runs, keyed by message id, so a retried
+# request resumes; set the path to a SQLite file to enable them
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH")
+CHECKPOINT_TTL_SECONDS = float(os.environ.get("CHECKPOINT_TTL_SECONDS", "3600"))
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = float(
+    os.environ.get("CHECKPOINT_SWEEP_INTERVAL_SECONDS", "300")
+)
+
+# How long a request arriving during a worker's warm-up waits for it before
+# being answered 503 with Retry-After
+WARMUP_WAIT_SECONDS = float(os.environ.get("WARMUP_WAIT_SECONDS", "10"))
@@ -0,0 +1,346 @@
+"""Fit history and retrieved context into each task's prompt token budget.
+
+History is kept newest-first until its share of the budget is spent; older
+turns are folded into a running summary in fixed-size blocks so each block is
+summarized once and reused from a cache. Retrieved passages are deduplicated,
+ranked against the query and packed into whatever budget remains.
+"""
+
+import re
+import time
+from typing import Any, Iterable, List, Optional
+from . import config, rate_limit
+from .cache import LRUCache, normalize_text
+from .metrics import LLM_CALLS, LLM_SECONDS, PACKING_DROPPED, PROMPT_TOKENS
+from .nodes.node_logging import get_node_logger
+from .sessions import prefix_digest
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is listed in requirements
+    tiktoken = None
+
+logger = get_node_logger(__name__)
+
+# Rough per-message framing cost of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+_WORD = re.compile(r"\w+")
+# model -> encoding, or None when only the character estimate is available
+_encodings: dict[str, Any] = {}
+
+
+def _encoding(model: str):
+    if model in _encodings:
+        return _encodings[model]
+    encoding = None
+    if tiktoken is not None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Non-OpenAI models: cl100k is close enough for budgeting
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # BPE files are fetched on first use; offline hosts fall back
+            logger.warning(f"Tokenizer unavailable for {model}, estimating: {str(e)}")
+    _encodings[model] = encoding
+    return encoding
+
+
+def warm_tokenizers() -> None:
+    """Load every configured model's encoding ahead of the first request."""
+    for model_config in config.MODEL_CONFIG.values():
+        _encoding(model_config["model"])
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def as_message(turn: Any) -> dict:
+    """Session turns carry their role; bare history strings are user turns."""
+    if isinstance(turn, str):
+        return {"role": "user", "content": turn}
+    return {"role": turn["role"], "content": turn["content"]}
+
+
+def message_tokens(messages: Iterable[dict], model: str) -> int:
+    return sum(
+        count_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages
+    )
+
+
+def render_passage(item: Any) -> str:
+    """Flatten a docs passage (str) or web result (dict) into prompt text."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        parts = [item.get("title"), item.get("snippet") or item.get("content")]
+        url = item.get("url") or item.get("link")
+        if url:
+            parts.append(f"Source: {url}")
+        text = "\n".join(p for p in parts if p)
+        if text:
+            return text
+    return str(item)
+
+
+def _terms(text: str) -> set[str]:
+    return {w for w in _WORD.findall(text.casefold()) if len(w) > 2}
+
+
+def pack_passages(
+    items: Iterable[Any], query: str, budget: int, model: str
+) -> tuple[List[str], int]:
+    """Return the passages to include and how many were left out.
+
+    Duplicates (same normalized text) are dropped, the rest are ranked by
+    query-term overlap with the tools' own order as tie-break, and packed
+    greedily so a long passage does not block shorter ones behind it.
+    """
+    seen = set()
+    candidates = []
+    for item in items:
+        text = render_passage(item).strip()
+        key = normalize_text(text)
+        if not text or key in seen:
+            continue
+        seen.add(key)
+        candidates.append(text)
+
+    query_terms = _terms(query)
+    if query_terms:
+        # sorted() is stable, so equal scores keep the retriever's ranking
+        candidates = sorted(
+            candidates, key=lambda t: -len(query_terms & _terms(t)) / len(query_terms)
+        )
+
+    packed = []
+    for text in candidates:
+        cost = count_tokens(text, model) + MESSAGE_OVERHEAD_TOKENS
+        if cost <= budget:
+            packed.append(text)
+            budget -= cost
+    return packed, len(candidates) - len(packed)
+
+
+class HistoryCompactor:
+    """Truncates history recent-first and summarizes what falls off the front.
+
+    Summaries are keyed by a rolling hash of the summarized prefix, so a
+    session pays for one summary call per ``block`` turns that age out, and
+    every later request reuses the cached result. Stored session turns carry
+    that hash already; only history sent inline is hashed here. Blocks are
+    counted from the start of the session, so they stay put when the store
+    trims the oldest turns off the window it returns. Without an explicit
+    ``client`` the summary model's provider client is looked up per call.
+    """
+
+    def __init__(self, client=None, block: int = 8, max_entries: int = 4096):
+        self.client = client
+        self.block = max(1, block)
+        self.summaries = LRUCache(max_entries=max_entries, ttl=float("inf"))
+        self.summary_calls = 0
+
+    @staticmethod
+    def _prefix_keys(turns: List[Any]) -> List[str]:
+        """keys[n] identifies turns[:n]."""
+        keys = [""]
+        for t in turns:
+            digest = t.get("digest") if isinstance(t, dict) else None
+            if digest is None:
+                m = as_message(t)
+                digest = prefix_digest(keys[-1], m["role"], m["content"])
+            keys.append(digest)
+        return keys
+
+    @staticmethod
+    def _offset(turns: List[Any]) -> int:
+        """Session position of turns[0], from the first stored turn that has one."""
+        for i, t in enumerate(turns):
+            if isinstance(t, dict) and t.get("position") is not None:
+                return t["position"] - i
+        return 0
+
+    def _client(self):
+        if self.client is not None:
+            return self.client
+        return config.get_client(config.get_model_config("summary")["model"])
+
+    async def _summarize(self, previous: Optional[str], turns: List[dict]) -> str:
+        model_config = config.get_model_config("summary")
+        model = model_config["model"]
+        system = config.get_system_prompt("summary")
+        # Normally one block; after a restart the whole window, which may not
+        # fit the summary model, so keep the newest turns that do
+        budget = model_config["prompt_budget"] - message_tokens(
+            [{"content": system}, {"content": previous or ""}], model
+        )
+        start = len(turns)
+        while start > 0:
+            cost = count_tokens(turns[start - 1]["content"], model)
+            budget -= cost + MESSAGE_OVERHEAD_TOKENS
+            if budget < 0:
+                break
+            start -= 1
+        if start:
+            logger.info(f"Summary of {len(turns)} turns drops the oldest {start}")
+            turns = turns[start:]
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+        if previous:
+            transcript = f"Summary so far:\n{previous}\n\nNew turns:\n{transcript}"
+        await rate_limit.acquire(model)
+        start = time.perf_counter()
+        try:
+            response = await self._client().chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": transcript},
+                ],
+                temperature=model_config["temperature"],
+                max_tokens=model_config["max_tokens"],
+            )
+        except Exception:
+            LLM_CALLS.inc("history_summary", model, "error")
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, "history_summary", model)
+        LLM_CALLS.inc("history_summary", model, "ok")
+        self.summary_calls += 1
+        return response.choices[0].message.content or ""
+
+    async def _summary_for(self, turns: List[Any], cut: int) -> Optional[str]:
+        keys = self._prefix_keys(turns[:cut])
+        cached = self.summaries.get(keys[cut])
+        if cached is not None:
+            return cached
+        # Resume from the longest block boundary already summarized
+        start = cut - self.block
+        while start > 0 and self.summaries.get(keys[start]) is None:
+            start -= self.block
+        start = max(start, 0)
+        previous = self.summaries.get(keys[start]) if start else None
+        # One call covers everything since that boundary (usually one block;
+        # the whole prefix after a restart or for inline client history)
+        summary = await self._summarize(
+            previous, [as_message(t) for t in turns[start:cut]]
+        )
+        self.summaries.set(keys[cut], summary)
+        return summary
+
+    async def compact(
+        self, history: Iterable[Any], budget: int, model: str
+    ) -> tuple[List[dict], int]:
+        """Return the messages to send and how many turns were summarized away."""
+        turns = list(history)
+        messages = [as_message(t) for t in turns]
+        used = 0
+        keep_from = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            cost = count_tokens(messages[i]["content"], model) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > budget:
+                break
+            used += cost
+            keep_from = i
+        if keep_from == 0:
+            return messages, 0
+
+        # Leave room for the summary itself
+        reserve = config.get_model_config("summary")["max_tokens"]
+        while keep_from < len(messages) and used > budget - reserve:
+            used -= (
+                count_tokens(messages[keep_from]["content"], model)
+                + MESSAGE_OVERHEAD_TOKENS
+            )
+            keep_from += 1
+
+        # Summaries are cached on block boundaries, counted in session
+        # positions. Summarize up to the next boundary while that still leaves
+        # the latest exchange verbatim, otherwise up to the previous one and
+        # drop the turns in between.
+        offset = self._offset(turns)
+        position = offset + keep_from
+        boundary = -(-position // self.block) * self.block - offset
+        if boundary > len(messages) - 2:
+            boundary = max(position - position % self.block - offset, 0)
+        keep_from = max(keep_from, boundary)
+
+        summary = None
+        if boundary and self._client() is not None:
+            try:
+                summary = await self._summary_for(turns, boundary)
+            except Exception as e:
+                logger.warning(f"History summary failed, truncating only: {str(e)}")
+        kept = messages[keep_from:]
+        if summary:
+            kept.insert(
+                0,
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{summary}",
+                },
+            )
+        return kept, keep_from
+
+    def stats(self) -> dict:
+        return {"summaries": len(self.summaries), "summary_calls": self.summary_calls}
+
+
+compactor = HistoryCompactor(
+    block=config.SUMMARY_BLOCK_TURNS,
+    max_entries=config.SUMMARY_CACHE_MAX_ENTRIES,
+)
+
+
+async def pack_prompt(
+    task: str,
+    query: str,
+    history: Iterable[Any] = (),
+    context: Iterable[Any] = (),
+    prompt: Optional[str] = None,
+) -> List[dict]:
+    """Build the chat messages for ``task`` within its ``prompt_budget``.
+
+    ``prompt`` is the final user message when it differs from the raw query
+    (the generators wrap the query in an instruction); passages are still
+    ranked against ``query``.
+    """
+    model_config = config.get_model_config(task)
+    model = model_config["model"]
+    system = {"role": "system", "content": config.get_system_prompt(task)}
+    user_prompt = prompt or query
+    context = list(context or [])
+
+    remaining = model_config["prompt_budget"] - message_tokens(
+        [system, {"role": "user", "content": user_prompt}], model
+    )
+    remaining = max(remaining, 0)
+    history_budget = (
+        int(remaining * config.HISTORY_BUDGET_SHARE) if context else remaining
+    )
+    history_messages, summarized = await compactor.compact(
+        history or [], history_budget, model
+    )
+    remaining -= message_tokens(history_messages, model)
+
+    passages: List[str] = []
+    if context:
+        # Leave room for the framing around the passages
+        passages, left_out = pack_passages(context, query, remaining - 16, model)
+        if left_out:
+            PACKING_DROPPED.inc(task, "passages", amount=left_out)
+    if summarized:
+        PACKING_DROPPED.inc(task, "history_turns", amount=summarized)
+
+    if passages:
+        numbered = "\n\n".join(f"[{i}] {p}" for i, p in enumerate(passages, 1))
+        user_prompt = (
+            f"Use the following context where relevant:\n\n{numbered}\n\n{user_prompt}"
+        )
+    messages = [system, *history_messages, {"role": "user", "content": user_prompt}]
+    PROMPT_TOKENS.observe(message_tokens(messages, model), task)
+    return messages
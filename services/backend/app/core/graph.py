@@ -1,46 +1,42 @@
 import logging
 import asyncio
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Any, Callable
+from typing import Any, Callable
+from . import config, speculation
+from .checkpoints import checkpointed
+from .state import GraphState
 from .nodes import (
     classify_query,
     simple_responder,
-    web_search_trigger,
-    docs_retriever_trigger,
+    context_retriever,
     code_generator,
     text_generator,
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
-class GraphState(TypedDict):
-    query: str
-    response: str
-    context: dict
-
-
 def log_state_wrapper(node_name: str, node_func: Callable) -> Callable:
-    """Wrapper to log state before and after node execution."""
+    """Wrapper to log state before and after node execution.
+
+    The state is only formatted when DEBUG logging is enabled, so the wrapper
+    costs a level check per node otherwise.
+    """
+    is_async = asyncio.iscoroutinefunction(node_func)
 
     async def wrapped(state: dict[str, Any]) -> dict[str, Any]:
-        logger.debug(f"\n{'=' * 50}")
-        logger.debug(f"Entering node: {node_name}")
-        logger.debug(f"Input state: {state}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Entering node: %s\nInput state: %s", node_name, state)
 
         # Handle both async and sync functions
-        if asyncio.iscoroutinefunction(node_func):
+        if is_async:
             result = await node_func(state)
         else:
             result = node_func(state)
 
-        logger.debug(f"Node {node_name} completed")
-        logger.debug(f"Output state: {result}")
-        logger.debug(f"{'=' * 50}\n")
+        if debug:
+            logger.debug("Node %s completed\nState update: %s", node_name, result)
         return result
 
     return wrapped
@@ -49,15 +45,58 @@ def log_state_wrapper(node_name: str, node_func: Callable) -> Callable:
 def log_condition(name: str, condition_func: Callable) -> Callable:
     """Wrapper to log conditional transitions."""
 
-    def wrapped(state: dict[str, Any]) -> bool:
+    def wrapped(state: dict[str, Any]) -> Any:
         result = condition_func(state)
-        logger.debug(f"Condition check for transition to {name}: {result}")
-        logger.debug(f"Current state for condition: {state}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Condition check for %s: %s", name, result)
         return result
 
     return wrapped
 
 
+def route_to_generator(state: dict[str, Any]) -> str:
+    """Pick the generator node for a non-simple query."""
+    return "code_gen" if state.get("wants_code", False) else "text_gen"
+
+
+def route_from_classifier(state: dict[str, Any]) -> str:
+    """Route to the responder, the retrieval stage, or straight to generation."""
+    if state.get("is_simple", True):
+        return "simple_responder"
+    if state.get("needs_web_search", False) or state.get("needs_doc", False):
+        return "retrieval"
+    return route_to_generator(state)
+
+
+async def speculative_classify(state: dict[str, Any]) -> dict[str, Any]:
+    """Classify while a simple response is already being generated.
+
+    The speculation is kept for the simple responder to adopt, or cancelled
+    as soon as the query is routed anywhere else. The classifier takes
+    microseconds, so it runs inline; the speculative request goes out while
+    the graph checkpoints the classification and moves to the responder.
+    """
+    speculation_id = speculation.start(state)
+    result = classify_query.classify(state)
+    if speculation_id is None:
+        return result
+    if route_from_classifier(result) == "simple_responder":
+        result["speculation_id"] = speculation_id
+    else:
+        speculation.cancel(speculation_id)
+    return result
+
+
+async def adopt_or_respond(state: dict[str, Any]) -> dict[str, Any]:
+    """Use the speculative answer if there is one, otherwise answer now."""
+    speculation_id = state.get("speculation_id")
+    if speculation_id:
+        result = await speculation.adopt(speculation_id)
+        if result is not None:
+            return result
+    return await simple_responder.respond(state)
+
+
 def visualize_graph(g: StateGraph) -> str:
     """Generate a Mermaid graph visualization of the LangGraph structure."""
     logger.info("Generating Mermaid graph visualization")
@@ -90,11 +129,9 @@ def visualize_graph(g: StateGraph) -> str:
             if source == "classifier":
                 if dest == "simple_responder":
                     edge_style = " -->|is_simple|"
-                elif dest == "web_search":
-                    edge_style = " -->|needs_web_search|"
-                elif dest == "docs_rag":
-                    edge_style = " -->|needs_doc|"
-            elif source in ["docs_rag", "web_search"]:
+                elif dest == "retrieval":
+                    edge_style = " -->|needs_web_search or needs_doc|"
+            if source in ["classifier", "retrieval"]:
                 if dest == "code_gen":
                     edge_style = " -->|wants_code|"
                 elif dest == "text_gen":
@@ -114,25 +151,32 @@ def dump_graph_visualization(g: StateGraph, output_path: str = "graph.mmd"):
     return output_path
 
 
-def build_graph():
+def build_graph(speculative: bool = config.SPECULATIVE_RESPONDER):
+    """Build the full workflow.
+
+    With ``speculative`` the simple responder starts alongside the classifier
+    and its answer is used if the query turns out to be simple.
+    """
     logger.info("Building LangGraph workflow")
     g = StateGraph(state_schema=GraphState)
 
-    # Add nodes with logging wrappers
+    # Add nodes with logging wrappers. Checkpointing wraps the logging, so a
+    # node replayed from a checkpoint is neither run nor logged again.
     logger.info("Adding nodes to graph...")
-    g.add_node("classifier", log_state_wrapper("classifier", classify_query.classify))
-    g.add_node(
-        "simple_responder",
-        log_state_wrapper("simple_responder", simple_responder.respond),
-    )
-    g.add_node(
-        "web_search", log_state_wrapper("web_search", web_search_trigger.fetch_search)
-    )
-    g.add_node(
-        "docs_rag", log_state_wrapper("docs_rag", docs_retriever_trigger.fetch_rag)
-    )
-    g.add_node("code_gen", log_state_wrapper("code_gen", code_generator.gen_code))
-    g.add_node("text_gen", log_state_wrapper("text_gen", text_generator.gen_text))
+    if speculative:
+        logger.info("Speculative simple responder enabled")
+        classify, respond = speculative_classify, adopt_or_respond
+    else:
+        classify, respond = classify_query.classify, simple_responder.respond
+
+    def add_node(name: str, func: Callable) -> None:
+        g.add_node(name, checkpointed(name, log_state_wrapper(name, func)))
+
+    add_node("classifier", classify)
+    add_node("simple_responder", respond)
+    add_node("retrieval", context_retriever.fetch_context)
+    add_node("code_gen", code_generator.gen_code)
+    add_node("text_gen", text_generator.gen_text)
 
     # Set entry point
     logger.info("Setting classifier as entry point")
@@ -142,53 +186,27 @@ def build_graph():
     logger.info("Adding conditional edges from classifier")
     g.add_conditional_edges(
         "classifier",
-        {
-            "simple_responder": log_condition(
-                "simple_responder",
-                lambda x: x.get(
-                    "is_simple", True
-                ),  # Changed default to True for testing
-            ),
-            "web_search": log_condition(
-                "web_search", lambda x: x.get("needs_web_search", False)
-            ),
-            "docs_rag": log_condition("docs_rag", lambda x: x.get("needs_doc", False)),
-        },
-    )
-
-    logger.info("Adding conditional edges from docs_rag")
-    g.add_conditional_edges(
-        "docs_rag",
-        {
-            "code_gen": log_condition(
-                "code_gen_from_docs", lambda x: x.get("wants_code", False)
-            ),
-            "text_gen": log_condition(
-                "text_gen_from_docs", lambda x: x.get("wants_text", False)
-            ),
-        },
+        log_condition("classifier", route_from_classifier),
+        ["simple_responder", "retrieval", "code_gen", "text_gen"],
     )
 
-    logger.info("Adding conditional edges from web_search")
+    # Web search and docs RAG run concurrently inside the retrieval stage,
+    # so a query needing both waits for the slowest tool rather than the sum
+    logger.info("Adding conditional edges from retrieval")
     g.add_conditional_edges(
-        "web_search",
-        {
-            "code_gen": log_condition(
-                "code_gen_from_web", lambda x: x.get("wants_code", False)
-            ),
-            "text_gen": log_condition(
-                "text_gen_from_web", lambda x: x.get("wants_text", False)
-            ),
-        },
+        "retrieval",
+        log_condition("retrieval", route_to_generator),
+        ["code_gen", "text_gen"],
     )
 
     # Add terminal edges with state propagation
     logger.info("Adding terminal edges")
 
     def end_handler(state):
-        """Ensure state is propagated to the end"""
-        logger.debug(f"Final state at END: {state}")
-        return state
+        """Log the final state; the node changes nothing"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Final state at END: %s", state)
+        return {}
 
     g.add_node("end", end_handler)
     g.add_edge("simple_responder", "end")
@@ -1,17 +1,13 @@
 import logging
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Any
+from .checkpoints import checkpointed
 from .nodes import simple_responder
 from .nodes.node_logging import get_node_logger
+from .state import SimpleGraphState
 
 logger = get_node_logger(__name__)
 
 
-class SimpleGraphState(TypedDict):
-    query: str
-    response: str
-
-
 def build_simple_graph():
     """Builds a simple workflow that just responds to queries directly."""
     logger.info("Building simple LangGraph workflow")
@@ -21,7 +17,7 @@ def build_simple_graph():
 
     # Add the simple responder node
     logger.info("Adding simple responder node")
-    g.add_node("responder", simple_responder.respond)
+    g.add_node("responder", checkpointed("responder", simple_responder.respond))
 
     # Set it as entry point
     logger.info("Setting entry point")
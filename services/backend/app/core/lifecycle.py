@@ -0,0 +1,134 @@
+"""Worker warm-up state and process measurements for the health endpoints.
+
+Each worker starts accepting connections before it is warm. Liveness holds
+from the start, and readiness once every warm-up step has finished. Steps
+are things like compiling the workflow and creating provider clients.
+Startup times and memory are reported so replicas can be sized and their
+cold start tracked.
+"""
+
+import asyncio
+import json
+import os
+import resource
+import time
+from typing import Awaitable, Callable, Optional
+from .nodes.node_logging import get_node_logger
+
+logger = get_node_logger(__name__)
+
+# Set by the pre-fork server in each worker: its fork time, and where the
+# ready report is written
+started_at: Optional[float] = None
+report_fd: Optional[int] = None
+
+
+def process_start_time() -> Optional[float]:
+    """Wall-clock time this process started (its fork, for pre-forked workers)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    started_after_boot = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    return time.time() - uptime + started_after_boot
+
+
+def memory_usage() -> dict[str, Optional[float]]:
+    """Resident, proportional (PSS) and shared memory of this process in MiB.
+
+    PSS splits pages shared with the pre-fork master and sibling workers
+    between them, so summing it over workers gives the real footprint.
+    """
+    usage: dict[str, Optional[float]] = {
+        "rss_mb": None,
+        "pss_mb": None,
+        "shared_mb": None,
+    }
+    fields = {"Rss:": "rss_mb", "Pss:": "pss_mb"}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            shared = 0
+            for line in f:
+                name, value = line.split()[:2]
+                if name in fields:
+                    usage[fields[name]] = int(value) / 1024
+                elif name in ("Shared_Clean:", "Shared_Dirty:"):
+                    shared += int(value)
+            usage["shared_mb"] = shared / 1024
+    except (OSError, ValueError):
+        # Peak RSS is all that is portable (KiB on Linux)
+        usage["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+class Warmup:
+    def __init__(self):
+        self.created = time.time()
+        self.steps: dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        self._done = asyncio.Event()
+
+    @property
+    def started(self) -> float:
+        # The instance is created at import, which is before the fork when
+        # pre-forked
+        return started_at or process_start_time() or self.created
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    async def run(self, steps: list[tuple[str, Callable[[], Awaitable]]]) -> None:
+        """Run the steps in order, timing each; a failure leaves the worker unready."""
+        try:
+            for name, step in steps:
+                start = time.perf_counter()
+                await step()
+                self.steps[name] = time.perf_counter() - start
+            self.ready_at = time.time()
+            report = self.report()
+            logger.info(
+                f"Worker {os.getpid()} ready {report['ready_after_seconds']:.2f}s "
+                f"after start, RSS {report['rss_mb']:.0f} MiB"
+            )
+            announce(report)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Warm-up failed: {self.error}", exc_info=True)
+        finally:
+            self._done.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` for warm-up; return whether the worker is ready."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def report(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "ready": self.ready,
+            "error": self.error,
+            "steps": self.steps,
+            "ready_after_seconds": (
+                self.ready_at - self.started if self.ready_at else None
+            ),
+            **memory_usage(),
+        }
+
+
+def announce(report: dict) -> None:
+    """Pass the ready report to the pre-fork master, if there is one."""
+    if report_fd is None:
+        return
+    try:
+        os.write(report_fd, (json.dumps(report) + "\n").encode())
+    except OSError:
+        pass
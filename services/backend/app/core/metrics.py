@@ -0,0 +1,263 @@
+"""Lightweight in-process metrics rendered in the Prometheus text format.
+
+Recording a sample is a dict lookup and a couple of additions, so spans can
+stay enabled on every request; nothing is formatted until ``/metrics`` is
+scraped.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {value}"
+
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values) -> None:
+        self.values[label_values] = value
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self.series[label_values] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {total}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        # Callbacks run at scrape time to refresh gauges owned by other modules
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = [line for metric in self.metrics for line in metric.collect()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels))
+
+
+def histogram(
+    name: str,
+    help: str,
+    labels: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+NODE_SECONDS = histogram(
+    "llmflow_node_duration_seconds", "Wall time spent in each graph node", ("node",)
+)
+NODE_ERRORS = counter(
+    "llmflow_node_errors_total", "Exceptions raised by graph nodes", ("node",)
+)
+NODE_STATE_ITEMS = histogram(
+    "llmflow_node_state_items",
+    "Number of context passages / history turns in a node's input state",
+    ("node", "field"),
+    SIZE_BUCKETS,
+)
+LLM_CALLS = counter(
+    "llmflow_llm_calls_total", "Chat completion calls", ("node", "model", "status")
+)
+LLM_SECONDS = histogram(
+    "llmflow_llm_duration_seconds", "Chat completion wall time", ("node", "model")
+)
+LLM_TTFT = histogram(
+    "llmflow_llm_time_to_first_token_seconds",
+    "Time until the first streamed completion token",
+    ("node", "model"),
+)
+LLM_TOKENS = counter(
+    "llmflow_llm_tokens_total",
+    "Prompt and completion tokens (reported usage, or estimated)",
+    ("provider", "model", "kind"),
+)
+LLM_COST = counter(
+    "llmflow_llm_cost_usd_total", "Estimated spend at list price", ("provider", "model")
+)
+ROUTER_DECISIONS = counter(
+    "llmflow_router_decisions_total",
+    "Model chosen per task and the policy branch that chose it",
+    ("task", "model", "reason"),
+)
+LLM_RETRIES = counter(
+    "llmflow_llm_retries_total",
+    "Chat completions retried before their first token",
+    ("node", "model", "reason"),
+)
+LLM_HEDGES = counter(
+    "llmflow_llm_hedges_total",
+    "Hedged duplicate requests sent, and how many of them won",
+    ("node", "model", "outcome"),
+)
+LLM_FALLBACKS = counter(
+    "llmflow_llm_fallbacks_total",
+    "Calls moved to the fallback model to meet their deadline",
+    ("node", "model", "fallback"),
+)
+SPECULATION_OUTCOMES = counter(
+    "llmflow_speculation_total",
+    "Speculative simple responses that were used (hit), cancelled, or not "
+    "started for lack of an admission slot (saturated)",
+    ("outcome",),
+)
+SPECULATION_WASTED_TOKENS = counter(
+    "llmflow_speculation_wasted_tokens_total",
+    "Completion tokens streamed by speculative responses that were cancelled",
+)
+SPECULATION_HEAD_START = histogram(
+    "llmflow_speculation_head_start_seconds",
+    "How long a speculative response had been running when it was adopted",
+)
+CLASSIFIER_OVERRIDES = counter(
+    "llmflow_classifier_overrides_total",
+    "Route flags where the local classifier model overruled the keywords",
+    ("route",),
+)
+ARTIFACTS_EVICTED = counter(
+    "llmflow_artifacts_evicted_total",
+    "Artifact files removed by the retention sweep",
+    ("reason",),
+)
+CHECKPOINT_RUNS = counter(
+    "llmflow_checkpoint_runs_total",
+    "Checkpointed runs started (new), resumed, answered from a stored "
+    "result (completed) or expired",
+    ("outcome",),
+)
+CHECKPOINT_NODES_RESUMED = counter(
+    "llmflow_checkpoint_nodes_resumed_total",
+    "Workflow nodes replayed from a checkpoint instead of run again",
+    ("node",),
+)
+TOOL_CALLS = counter(
+    "llmflow_tool_calls_total", "MCP tool calls", ("service", "tool", "status")
+)
+TOOL_SECONDS = histogram(
+    "llmflow_tool_duration_seconds", "MCP tool call wall time", ("service", "tool")
+)
+PROMPT_TOKENS = histogram(
+    "llmflow_prompt_tokens",
+    "Estimated prompt tokens after context packing",
+    ("task",),
+    TOKEN_BUCKETS,
+)
+PACKING_DROPPED = counter(
+    "llmflow_packing_dropped_total",
+    "History turns summarized away and passages left out to fit the budget",
+    ("task", "kind"),
+)
+RATE_LIMIT_WAIT_SECONDS = histogram(
+    "llmflow_rate_limit_wait_seconds",
+    "Time LLM calls waited for their provider's rate limit",
+    ("provider",),
+)
+BATCH_ITEMS = counter(
+    "llmflow_batch_items_total", "Items processed by /chat/batch", ("status",)
+)
+ADMISSION_WAIT_SECONDS = histogram(
+    "llmflow_admission_wait_seconds",
+    "Time requests spent queued before being admitted",
+    ("model", "priority"),
+)
+ADMISSION_REJECTED = counter(
+    "llmflow_admission_rejected_total",
+    "Requests shed because the queue was full or their deadline passed",
+    ("model", "reason"),
+)
+REQUEST_SECONDS = histogram(
+    "llmflow_request_duration_seconds", "End-to-end request latency", ("endpoint",)
+)
+
+
+def record_state_sizes(node: str, state) -> None:
+    """Record payload sizes with len() only; the state is never serialized."""
+    if not isinstance(state, dict):
+        return
+    for field in ("context", "history"):
+        value = state.get(field)
+        if value is not None:
+            NODE_STATE_ITEMS.observe(len(value), node, field)
@@ -0,0 +1,72 @@
+"""Rolling per-model latency and error samples for hedging, fallback and routing."""
+
+from collections import deque
+from typing import Optional
+
+
+class RollingWindow:
+    """The last ``size`` samples, with percentiles computed on demand.
+
+    The sorted copy is cached until the next sample arrives, so repeated
+    reads between completions cost a list index.
+    """
+
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._sorted: Optional[list[float]] = None
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self._sorted = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the ``q`` quantile (0-1), or None until enough samples exist."""
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(int(q * len(self._sorted)), len(self._sorted) - 1)
+        return self._sorted[index]
+
+    def mean(self) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        return sum(self.samples) / len(self.samples)
+
+
+class ModelStats:
+    def __init__(self, size: int = 256):
+        self.ttft = RollingWindow(size)
+        self.duration = RollingWindow(size)
+        # 1.0 per failed call, 0.0 per successful one
+        self.errors = RollingWindow(size)
+        self.cost = RollingWindow(size)
+
+    def summary(self) -> dict:
+        return {
+            "samples": len(self.duration),
+            "ttft_p50": self.ttft.percentile(0.5),
+            "ttft_p95": self.ttft.percentile(0.95),
+            "duration_p50": self.duration.percentile(0.5),
+            "duration_p95": self.duration.percentile(0.95),
+            "error_rate": self.errors.mean(),
+            "mean_cost_usd": self.cost.mean(),
+        }
+
+
+_stats: dict[str, ModelStats] = {}
+
+
+def stats_for(model: str) -> ModelStats:
+    stats = _stats.get(model)
+    if stats is None:
+        stats = _stats[model] = ModelStats()
+    return stats
+
+
+def all_stats() -> dict[str, ModelStats]:
+    return _stats
@@ -1,11 +1,11 @@
-from pathlib import Path
 import re
-import uuid
-from app.core.config import get_model_config, get_system_prompt, openai_client
+from app.core.artifacts import open_artifact
+from app.core.context_packing import pack_prompt
 from app.core.nodes.node_logging import log_node_calls, get_node_logger
+from app.core.router import router
+from app.core.streaming import stream_completion
 
 logger = get_node_logger(__name__)
-client = openai_client
 
 
 @log_node_calls
@@ -18,19 +18,30 @@ async def gen_code(state):
             lang = "cpp" if "c" in key else ("typescript" if "ts" in key else "java")
     ext = {"python": ".py", "cpp": ".cpp", "typescript": ".ts", "java": ".java"}[lang]
     prompt = f"Write a complete {lang} code file that {state['query']}"
-    # Get code-specific model configuration
-    model_config = get_model_config("code")
-    resp = await client.chat.completions.create(
-        model=model_config["model"],
-        messages=[
-            {"role": "system", "content": get_system_prompt("code")},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=model_config["temperature"],
-        max_tokens=model_config["max_tokens"],
-    )
-    code = resp.choices[0].message.content
-    fpath = Path(f"/mnt/data/{uuid.uuid4()}{ext}")
-    fpath.write_text(code)
-    state["generated_file"] = str(fpath)
-    return state
+    # Route to a code model and its provider client
+    route = router.choose("code", state["query"])
+    model_config = route.config
+    # Stream the artifact to disk as tokens arrive so it can be downloaded
+    # while it is still being generated
+    artifact = open_artifact("code_gen", ext)
+    try:
+        await stream_completion(
+            route.client,
+            "code_gen",
+            model=model_config["model"],
+            fallback_model=model_config.get("fallback_model"),
+            on_delta=artifact.write,
+            messages=await pack_prompt(
+                "code",
+                state["query"],
+                state.get("history") or (),
+                state.get("context") or (),
+                prompt=prompt,
+            ),
+            temperature=model_config["temperature"],
+            max_tokens=model_config["max_tokens"],
+        )
+    except BaseException:
+        await artifact.abort()
+        raise
+    return {"generated_file": str(await artifact.close())}
@@ -0,0 +1,87 @@
+"""Fan out to the web search and docs retrieval tools concurrently and merge their context."""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Optional
+from app.core.config import DOCS_RAG_TIMEOUT_SECONDS, WEB_SEARCH_TIMEOUT_SECONDS
+from .node_logging import log_node_calls, get_node_logger
+from . import docs_retriever_trigger, web_search_trigger
+
+logger = get_node_logger(__name__)
+
+
+def context_key(item: Any) -> str:
+    """Identity used to drop duplicate passages/results across tools."""
+    if isinstance(item, str):
+        return " ".join(item.split()).casefold()
+    if isinstance(item, dict):
+        for field in ("url", "link"):
+            if item.get(field):
+                return str(item[field])
+    return json.dumps(item, sort_keys=True, default=str)
+
+
+def merge_context(*sources: list) -> list:
+    """Concatenate context lists, keeping the first occurrence of each item."""
+    seen = set()
+    merged = []
+    for source in sources:
+        for item in source:
+            key = context_key(item)
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+
+async def _run_tool(
+    name: str, fetch: Callable[[dict], Awaitable[dict]], state: dict, timeout: float
+) -> Optional[list]:
+    """Run one retrieval trigger and return the passages it found.
+
+    Failures and timeouts are logged and return None, so the other tool's
+    results are still used.
+    """
+    try:
+        result = await asyncio.wait_for(fetch(state), timeout)
+        return list(result.get("context") or [])
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} timed out after {timeout}s, continuing without it")
+    except Exception as e:
+        logger.warning(f"{name} failed, continuing without it: {str(e)}")
+    return None
+
+
+@log_node_calls
+async def fetch_context(state):
+    names = []
+    tasks = []
+    if state.get("needs_web_search"):
+        names.append("web_search")
+        tasks.append(
+            _run_tool(
+                "web_search",
+                web_search_trigger.fetch_search,
+                state,
+                WEB_SEARCH_TIMEOUT_SECONDS,
+            )
+        )
+    if state.get("needs_doc"):
+        names.append("docs_rag")
+        tasks.append(
+            _run_tool(
+                "docs_rag",
+                docs_retriever_trigger.fetch_rag,
+                state,
+                DOCS_RAG_TIMEOUT_SECONDS,
+            )
+        )
+    results = await asyncio.gather(*tasks)
+    # Deduplicated against the context already in the state by its reducer
+    context = merge_context(*(r for r in results if r is not None))
+    logger.info(f"Merged {len(context)} context items from {len(tasks)} tools")
+    failed = tuple(name for name, r in zip(names, results) if r is None)
+    if failed:
+        # Partial context: good enough to answer with, not to checkpoint
+        return {"context": context, "tool_errors": failed}
+    return {"context": context}
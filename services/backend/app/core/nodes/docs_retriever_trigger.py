@@ -1,13 +1,13 @@
-from fastmcp import Client
+from app.core.tool_clients import tool_clients
 from .node_logging import log_node_calls, get_node_logger
 
 logger = get_node_logger(__name__)
-client = Client("http://docs_retriever_tool:7002")
 
 
 @log_node_calls
 async def fetch_rag(state):
     # assumes tool returns list of passages
-    res = await client.retrieve_docs(state["query"])
-    state.setdefault("context", []).extend(res["passages"])
-    return state
+    res = await tool_clients.call(
+        "docs_retriever", "retrieve_docs", {"query": state["query"]}
+    )
+    return {"context": res["passages"]}
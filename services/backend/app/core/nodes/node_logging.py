@@ -1,10 +1,10 @@
 """Utility functions for logging in nodes."""
 
+import asyncio
 import logging
 import functools
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+import time
+from app.core.metrics import NODE_ERRORS, NODE_SECONDS, record_state_sizes
 
 
 def get_node_logger(name: str) -> logging.Logger:
@@ -17,42 +17,61 @@ def get_node_logger(name: str) -> logging.Logger:
         )
         handler.setFormatter(formatter)
         logger.addHandler(handler)
+        # The dedicated handler already emits the record; don't format it twice
+        logger.propagate = False
     return logger
 
 
 def log_node_calls(func):
-    """Decorator to log node function calls."""
-    import asyncio
+    """Decorator to log node function calls and record a timing span.
+
+    State dumps are only formatted when DEBUG is enabled for the node logger;
+    the span (wall time, error count, input context/history sizes) is always
+    recorded in :mod:`app.core.metrics`. Nodes return only the keys they
+    change, so the result is logged as an update.
+    """
+    node = func.__name__
+    logger = get_node_logger(node)
+
+    def before(state) -> float:
+        logger.info("Entering node %s", node)
+        record_state_sizes(node, state)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Input state: %s", state)
+        return time.perf_counter()
+
+    def after(result, start: float) -> None:
+        NODE_SECONDS.observe(time.perf_counter() - start, node)
+        logger.info("Node %s completed successfully", node)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("State update: %s", result)
+
+    def failed(e: Exception, start: float) -> None:
+        NODE_SECONDS.observe(time.perf_counter() - start, node)
+        NODE_ERRORS.inc(node)
+        logger.error("Error in node %s: %s", node, e, exc_info=True)
 
     @functools.wraps(func)
     async def async_wrapper(state, *args, **kwargs):
-        logger = get_node_logger(func.__name__)
-        logger.info(f"Entering node {func.__name__}")
-        logger.debug(f"Input state: {state}")
-
+        start = before(state)
         try:
             result = await func(state, *args, **kwargs)
-            logger.info(f"Node {func.__name__} completed successfully")
-            logger.debug(f"Output state: {result}")
-            return result
         except Exception as e:
-            logger.error(f"Error in node {func.__name__}: {str(e)}", exc_info=True)
+            failed(e, start)
             raise
+        after(result, start)
+        return result
 
     @functools.wraps(func)
     def sync_wrapper(state, *args, **kwargs):
-        logger = get_node_logger(func.__name__)
-        logger.info(f"Entering node {func.__name__}")
-        logger.debug(f"Input state: {state}")
-
+        start = before(state)
         try:
             result = func(state, *args, **kwargs)
-            logger.info(f"Node {func.__name__} completed successfully")
-            logger.debug(f"Output state: {result}")
-            return result
         except Exception as e:
-            logger.error(f"Error in node {func.__name__}: {str(e)}", exc_info=True)
+            failed(e, start)
             raise
+        after(result, start)
+        return result
 
     if asyncio.iscoroutinefunction(func):
         return async_wrapper
@@ -1,66 +1,59 @@
 from typing import Any, List
-from app.core.config import get_model_config, get_system_prompt, openai_client
+from app.core.context_packing import pack_prompt
 from app.core.nodes.node_logging import log_node_calls, get_node_logger
+from app.core.router import router
+from app.core.streaming import stream_completion
 
 logger = get_node_logger(__name__)
 
-# Use common configuration
-client = openai_client
 
+async def prepare_messages(query: str, history: List[Any] = None) -> List[dict]:
+    """Prepare the message list for the OpenAI API call.
 
-def prepare_messages(query: str, history: List[str] = None) -> List[dict]:
-    """Prepare the message list for the OpenAI API call."""
-    messages = [{"role": "system", "content": get_system_prompt("chat")}]
-
-    # Add history messages if available
-    if history:
-        for msg in history:
-            messages.append({"role": "user", "content": msg})
-
-    # Add the current query
-    messages.append({"role": "user", "content": query})
-    return messages
+    History is compacted to the chat task's prompt budget: recent turns are
+    kept verbatim and older ones replaced by a cached summary.
+    """
+    return await pack_prompt("chat", query, history or [])
 
 
 @log_node_calls
 async def respond(inputs: dict[str, Any]) -> dict[str, Any]:
     try:
-        if not client:
-            error_msg = "OpenAI client not properly initialized. Check OPENAI_API_KEY environment variable."
-            logger.error(error_msg)
-            return {"response": error_msg}
-
         if "query" not in inputs:
             logger.warning("No query found in inputs")
             return {"response": inputs.get("message", "No message provided")}
 
-        messages = prepare_messages(
-            query=inputs["query"], history=inputs.get("history", [])
+        # Pick the chat model (and its provider's client) for this query
+        route = router.choose("chat", inputs["query"])
+        if not route.client:
+            error_msg = f"No client configured for {route.model}. Check the provider API key environment variables."
+            logger.error(error_msg)
+            return {"response": error_msg, "error": error_msg}
+
+        messages = await prepare_messages(
+            query=inputs["query"], history=inputs.get("history", ())
         )
 
-        logger.debug(f"Sending request with {len(messages)} messages")
+        logger.debug("Sending request with %d messages", len(messages))
         try:
-            response = ""
-            # Get chat-specific model configuration
-            model_config = get_model_config("chat")
-            async for chunk in await client.chat.completions.create(
+            model_config = route.config
+            response = await stream_completion(
+                route.client,
+                "simple_responder",
                 model=model_config["model"],
+                fallback_model=model_config.get("fallback_model"),
                 messages=messages,
-                stream=True,
                 temperature=model_config["temperature"],
                 max_tokens=model_config["max_tokens"],
-            ):
-                if chunk.choices[0].delta.content:
-                    response += chunk.choices[0].delta.content
+            )
 
-            inputs["response"] = response
-            logger.debug(f"Returning state from responder: {inputs}")
-            return inputs
+            return {"response": response}
         except Exception as api_error:
             error_msg = f"OpenAI API error: {str(api_error)}"
             logger.error(error_msg)
-            return {"response": error_msg}
+            return {"response": error_msg, "error": error_msg}
 
     except Exception as e:
         logger.error(f"Error in simple responder: {str(e)}", exc_info=True)
-        return {"response": f"An error occurred: {str(e)}"}
+        error_msg = f"An error occurred: {str(e)}"
+        return {"response": error_msg, "error": error_msg}
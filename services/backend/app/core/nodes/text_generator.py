@@ -1,29 +1,40 @@
-from pathlib import Path
-import uuid
-from app.core.config import get_model_config, get_system_prompt, openai_client
+from app.core.artifacts import open_artifact
+from app.core.context_packing import pack_prompt
 from app.core.nodes.node_logging import log_node_calls, get_node_logger
+from app.core.router import router
+from app.core.streaming import stream_completion
 
 logger = get_node_logger(__name__)
-client = openai_client
 
 
 @log_node_calls
 async def gen_text(state):
     fmt = ".md" if "markdown" in state["query"].lower() else ".txt"
     prompt = f"{state['query']}"
-    # Get text-specific model configuration
-    model_config = get_model_config("text")
-    resp = await client.chat.completions.create(
-        model=model_config["model"],
-        messages=[
-            {"role": "system", "content": get_system_prompt("text")},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=model_config["temperature"],
-        max_tokens=model_config["max_tokens"],
-    )
-    text = resp.choices[0].message.content
-    fpath = Path(f"/mnt/data/{uuid.uuid4()}{fmt}")
-    fpath.write_text(text)
-    state["generated_file"] = str(fpath)
-    return state
+    # Route to a text model and its provider client
+    route = router.choose("text", state["query"])
+    model_config = route.config
+    # Stream the artifact to disk as tokens arrive so it can be downloaded
+    # while it is still being generated
+    artifact = open_artifact("text_gen", fmt)
+    try:
+        await stream_completion(
+            route.client,
+            "text_gen",
+            model=model_config["model"],
+            fallback_model=model_config.get("fallback_model"),
+            on_delta=artifact.write,
+            messages=await pack_prompt(
+                "text",
+                state["query"],
+                state.get("history") or (),
+                state.get("context") or (),
+                prompt=prompt,
+            ),
+            temperature=model_config["temperature"],
+            max_tokens=model_config["max_tokens"],
+        )
+    except BaseException:
+        await artifact.abort()
+        raise
+    return {"generated_file": str(await artifact.close())}
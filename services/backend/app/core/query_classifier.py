@@ -0,0 +1,281 @@
+"""Route flags for a query from configured keyword sets and an optional local model.
+
+Keywords are compiled into a single regex, so a query is scanned once no
+matter how many keywords are configured. A small one-vs-rest logistic
+regression over hashed word n-grams can be trained from labelled queries and
+loaded with ``CLASSIFIER_MODEL_PATH``. Where it is confident it overrules the
+keywords, which keeps queries off the code generator and web search when
+they only happen to mention a keyword.
+
+Training:
+    python -m app.core.query_classifier queries.jsonl classifier.json
+
+Each input line is ``{"query": ..., "is_simple": bool, ...}`` with any of the
+route flags in :data:`ROUTES`; routes missing from a line are not trained on it.
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import zlib
+from typing import Iterable, Optional
+from . import config
+from .metrics import CLASSIFIER_OVERRIDES
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ("is_simple", "needs_web_search", "needs_doc", "wants_code")
+# Keyword set that sets each route flag ("complex" clears is_simple)
+KEYWORD_ROUTES = {
+    "web_search": "needs_web_search",
+    "doc": "needs_doc",
+    "code": "wants_code",
+}
+
+_TOKEN = re.compile(r"[\w.+#]+")
+
+
+def load_keywords(path: Optional[str] = None) -> dict[str, list[str]]:
+    """Return the default keyword sets, with those in ``path`` replacing them."""
+    keywords = dict(config.CLASSIFIER_KEYWORDS)
+    if path:
+        with open(path) as f:
+            keywords.update(json.load(f))
+    return keywords
+
+
+class KeywordMatcher:
+    """Find which keyword sets occur in a text in one regex pass."""
+
+    def __init__(self, keywords: dict[str, Iterable[str]]):
+        sets_for: dict[str, set[str]] = {}
+        for name, words in keywords.items():
+            for word in words:
+                sets_for.setdefault(word.lower(), set()).add(name)
+        # Only the longest keyword starting at each position is reported, so
+        # it also carries the sets of every keyword it contains
+        self._sets = {
+            word: frozenset().union(
+                *(names for other, names in sets_for.items() if other in word)
+            )
+            for word in sets_for
+        }
+        words = sorted(sets_for, key=len, reverse=True)
+        alternation = "|".join(map(re.escape, words))
+        self._pattern = re.compile(f"(?=({alternation}))") if words else None
+
+    def match(self, text: str) -> set[str]:
+        """Return the names of the keyword sets found in lowercase ``text``."""
+        found: set[str] = set()
+        if self._pattern is None:
+            return found
+        sets = self._sets
+        for word in set(self._pattern.findall(text)):
+            found |= sets[word]
+        return found
+
+
+def features(text: str, dim: int) -> list[int]:
+    """Hashed word unigrams, bigrams and a length bucket of lowercase ``text``."""
+    tokens = _TOKEN.findall(text)
+    grams = [f"len:{min(len(tokens) // 5, 10)}", *tokens]
+    grams.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return list({zlib.crc32(gram.encode()) % dim for gram in grams})
+
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+class HashedNgramModel:
+    """One-vs-rest logistic regression per route over hashed n-gram features.
+
+    Each route also has Platt scaling parameters fitted on held-out queries,
+    so :meth:`predict` returns calibrated probabilities.
+    """
+
+    def __init__(self, dim: int, routes: dict[str, dict]):
+        self.dim = dim
+        self.routes = routes
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramModel":
+        with open(path) as f:
+            data = json.load(f)
+        routes = {
+            route: {
+                "bias": params["bias"],
+                "weights": {int(i): w for i, w in params["weights"].items()},
+                "scale": params.get("scale", 1.0),
+                "offset": params.get("offset", 0.0),
+            }
+            for route, params in data["routes"].items()
+        }
+        return cls(data["dim"], routes)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"dim": self.dim, "routes": self.routes}, f)
+
+    @staticmethod
+    def _score(params: dict, indices: list[int]) -> float:
+        weights = params["weights"]
+        return params["bias"] + sum(weights.get(i, 0.0) for i in indices)
+
+    def predict(self, text: str) -> dict[str, float]:
+        """Probability of each route flag being true for lowercase ``text``."""
+        indices = features(text, self.dim)
+        return {
+            route: _sigmoid(
+                params["scale"] * self._score(params, indices) + params["offset"]
+            )
+            for route, params in self.routes.items()
+        }
+
+    @classmethod
+    def train(
+        cls,
+        examples: list[dict],
+        dim: int = 1 << 18,
+        epochs: int = 10,
+        learning_rate: float = 0.5,
+        l2: float = 1e-6,
+        holdout: float = 0.2,
+        seed: int = 0,
+    ) -> "HashedNgramModel":
+        """Fit each route by SGD on log loss, then calibrate on a held-out split."""
+        rng = random.Random(seed)
+        rows = [(features(e["query"].lower(), dim), e) for e in examples]
+        rng.shuffle(rows)
+        split = int(len(rows) * (1 - holdout)) if len(rows) >= 10 else len(rows)
+        fit_rows, calibration_rows = rows[:split], rows[split:] or rows
+
+        routes = {}
+        for route in ROUTES:
+            labelled = [(x, float(e[route])) for x, e in fit_rows if route in e]
+            if not labelled:
+                continue
+            params = {"bias": 0.0, "weights": {}, "scale": 1.0, "offset": 0.0}
+            weights = params["weights"]
+            for epoch in range(epochs):
+                rng.shuffle(labelled)
+                step = learning_rate / (1 + epoch)
+                for indices, y in labelled:
+                    gradient = _sigmoid(cls._score(params, indices)) - y
+                    params["bias"] -= step * gradient
+                    for i in indices:
+                        w = weights.get(i, 0.0)
+                        weights[i] = w - step * (gradient + l2 * w)
+            params["scale"], params["offset"] = _platt(
+                [
+                    (cls._score(params, x), float(e[route]))
+                    for x, e in calibration_rows
+                    if route in e
+                ]
+            )
+            routes[route] = params
+        return cls(dim, routes)
+
+
+def _platt(
+    scored: list[tuple[float, float]], iterations: int = 200
+) -> tuple[float, float]:
+    """Fit ``sigmoid(a * score + b)`` to held-out labels by gradient descent."""
+    if not scored:
+        return 1.0, 0.0
+    positives = sum(y for _, y in scored)
+    # Platt's smoothed targets keep a perfectly separated split from
+    # pushing the scale to infinity
+    high = (positives + 1) / (positives + 2)
+    low = 1 / (len(scored) - positives + 2)
+    targets = [(s, high if y else low) for s, y in scored]
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        grad_a = grad_b = 0.0
+        for s, t in targets:
+            error = _sigmoid(a * s + b) - t
+            grad_a += error * s
+            grad_b += error
+        a -= 0.1 * grad_a / len(targets)
+        b -= 0.1 * grad_b / len(targets)
+    return a, b
+
+
+class QueryClassifier:
+    def __init__(
+        self,
+        keywords: dict[str, Iterable[str]],
+        simple_max_words: int = 20,
+        model: Optional[HashedNgramModel] = None,
+        threshold: float = 0.8,
+    ):
+        self.matcher = KeywordMatcher(keywords)
+        self.simple_max_words = simple_max_words
+        self.model = model
+        self.threshold = threshold
+
+    def classify(self, query: str) -> dict[str, bool]:
+        """Return the route flags the graph branches on."""
+        lower = query.lower()
+        found = self.matcher.match(lower)
+        # Splitting stops once the query is known to be too long to be simple
+        words = len(query.split(maxsplit=self.simple_max_words))
+        flags = {
+            "is_simple": words < self.simple_max_words and "complex" not in found,
+            **{route: name in found for name, route in KEYWORD_ROUTES.items()},
+        }
+        if self.model is not None:
+            for route, probability in self.model.predict(lower).items():
+                if max(probability, 1 - probability) < self.threshold:
+                    continue
+                decision = probability >= 0.5
+                if flags.get(route) != decision:
+                    CLASSIFIER_OVERRIDES.inc(route)
+                    flags[route] = decision
+        flags["wants_text"] = not flags["wants_code"]
+        return flags
+
+
+def _load_model(path: Optional[str]) -> Optional[HashedNgramModel]:
+    if not path:
+        return None
+    try:
+        model = HashedNgramModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("Could not load classifier model %s: %s", path, e)
+        return None
+    logger.info("Loaded classifier model for %s", ", ".join(model.routes))
+    return model
+
+
+classifier = QueryClassifier(
+    load_keywords(config.CLASSIFIER_KEYWORDS_PATH),
+    simple_max_words=config.CLASSIFIER_SIMPLE_MAX_WORDS,
+    model=_load_model(config.CLASSIFIER_MODEL_PATH),
+    threshold=config.CLASSIFIER_MODEL_THRESHOLD,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the query route classifier.")
+    parser.add_argument("queries", help="JSONL file of labelled queries")
+    parser.add_argument("output", help="Where to write the model JSON")
+    parser.add_argument("--dim", type=int, default=1 << 18)
+    parser.add_argument("--epochs", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    model = HashedNgramModel.train(examples, dim=args.dim, epochs=args.epochs)
+    model.save(args.output)
+    print(f"Trained {', '.join(model.routes)} on {len(examples)} queries")
+
+
+if __name__ == "__main__":
+    main()
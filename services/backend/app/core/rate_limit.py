@@ -0,0 +1,51 @@
+"""Per-provider request rate limits shared by every LLM call in the process."""
+
+import asyncio
+import time
+from . import config
+from .metrics import RATE_LIMIT_WAIT_SECONDS
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` acquisitions per second, bursting to ``burst``.
+
+    Waiters are served in arrival order because the lock is held while
+    sleeping for the next token.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+limiters = {
+    provider: RateLimiter(rate)
+    for provider, rate in config.PROVIDER_RATE_LIMITS.items()
+}
+
+
+async def acquire(model: str) -> None:
+    """Wait for the model's provider to allow another request, if it is limited."""
+    provider = config.get_provider(model)
+    limiter = limiters.get(provider)
+    if limiter is None:
+        return
+    start = time.perf_counter()
+    await limiter.acquire()
+    RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, provider)
@@ -0,0 +1,124 @@
+"""Pick the model (and provider client) for each LLM call from live measurements.
+
+Decisions only read cached rolling percentiles from :mod:`model_stats` and
+list prices from ``MODEL_CATALOG``, so choosing a model costs microseconds.
+"""
+
+import contextvars
+import random
+from dataclasses import dataclass
+from typing import Any, Optional
+from . import config
+from .metrics import ROUTER_DECISIONS
+from .model_stats import stats_for
+
+
+@dataclass
+class Route:
+    task: str
+    model: str
+    client: Any
+    # The task's MODEL_CONFIG entry with ``model`` replaced by the choice
+    config: dict
+    reason: str
+
+
+# A route chosen before the run started (admission keys its slots by the
+# route's model); the run's nodes use it for that task instead of choosing
+pinned_route: contextvars.ContextVar[Optional[Route]] = contextvars.ContextVar(
+    "pinned_route", default=None
+)
+
+
+def list_price(model: str) -> float:
+    entry = config.MODEL_CATALOG.get(model)
+    if entry is None:
+        return float("inf")
+    return entry["input_cost"] + entry["output_cost"]
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        policy: str = "fixed",
+        explore_rate: float = 0.05,
+        max_error_rate: float = 0.1,
+        short_query_words: int = 20,
+    ):
+        self.policy = policy
+        self.explore_rate = explore_rate
+        self.max_error_rate = max_error_rate
+        self.short_query_words = short_query_words
+
+    def _healthy(self, model: str) -> bool:
+        error_rate = stats_for(model).errors.mean()
+        return error_rate is None or error_rate <= self.max_error_rate
+
+    def _meets_slo(self, model: str, default: str, slo: Optional[float]) -> bool:
+        if not self._healthy(model):
+            return False
+        p95 = stats_for(model).duration.percentile(0.95)
+        if p95 is None:
+            # Unmeasured models are trusted only if they are the configured one;
+            # the others get measured through exploration first
+            return model == default
+        return slo is None or p95 <= slo
+
+    def _fastest(self, candidates: list[str]) -> Optional[str]:
+        measured = [
+            (p50, model)
+            for model in candidates
+            if self._healthy(model)
+            and (p50 := stats_for(model).ttft.percentile(0.5)) is not None
+        ]
+        return min(measured)[1] if measured else None
+
+    def _pick(self, task: str, query: str, task_config: dict) -> tuple[str, str]:
+        default = task_config["model"]
+        if self.policy == "fixed":
+            return default, "fixed"
+        candidates = [
+            model
+            for model in task_config.get("candidates", [default])
+            if config.get_client(model) is not None
+        ] or [default]
+        if len(candidates) > 1 and random.random() < self.explore_rate:
+            return random.choice(candidates), "explore"
+
+        short = len(query.split()) < self.short_query_words
+        if self.policy == "fastest" or (
+            self.policy == "auto" and task == "chat" and short
+        ):
+            fastest = self._fastest(candidates)
+            return (fastest, "fastest") if fastest else (default, "unmeasured")
+
+        slo = task_config.get("latency_slo_seconds")
+        eligible = [m for m in candidates if self._meets_slo(m, default, slo)]
+        if eligible:
+            return min(eligible, key=list_price), "slo"
+        # Nothing meets the SLO: get as close to it as possible
+        fastest = self._fastest(candidates)
+        return (fastest, "slo_missed") if fastest else (default, "unmeasured")
+
+    def choose(self, task: str, query: str = "") -> Route:
+        pinned = pinned_route.get()
+        if pinned is not None and pinned.task == task:
+            return pinned
+        task_config = config.get_model_config(task)
+        model, reason = self._pick(task, query, task_config)
+        ROUTER_DECISIONS.inc(task, model, reason)
+        return Route(
+            task=task,
+            model=model,
+            client=config.get_client(model),
+            config={**task_config, "model": model},
+            reason=reason,
+        )
+
+
+router = ModelRouter(
+    policy=config.ROUTER_POLICY,
+    explore_rate=config.ROUTER_EXPLORE_RATE,
+    max_error_rate=config.ROUTER_MAX_ERROR_RATE,
+    short_query_words=config.ROUTER_SHORT_QUERY_WORDS,
+)
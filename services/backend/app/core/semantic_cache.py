@@ -0,0 +1,141 @@
+"""Semantic response cache: answers paraphrased queries from a vector index."""
+
+import time
+from typing import Any, Optional
+import numpy as np
+from . import rate_limit
+from .nodes.node_logging import get_node_logger
+
+logger = get_node_logger(__name__)
+
+
+class VectorIndex:
+    """Fixed-capacity matrix of unit vectors searched with one matrix-vector product.
+
+    Rows are tagged with a partition id (workflow/task/model) and an insertion
+    time, so filtering by partition and age is a vectorized mask rather than a
+    Python loop. When the index is full the oldest row is overwritten, which
+    evicts by capacity and age in the same step.
+    """
+
+    def __init__(self, dim: int, capacity: int, ttl: float):
+        self.dim = dim
+        self.capacity = capacity
+        self.ttl = ttl
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._created = np.full(capacity, -np.inf, dtype=np.float64)
+        self._partitions = np.full(capacity, -1, dtype=np.int32)
+        self._values: list[Any] = [None] * capacity
+        self._partition_ids: dict[str, int] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._partitions[: self._size] >= 0))
+
+    def search(
+        self, vector: np.ndarray, partition: str, k: int = 1
+    ) -> list[tuple[float, Any]]:
+        """Return up to ``k`` live ``(score, value)`` pairs, best first."""
+        pid = self._partition_ids.get(partition)
+        if pid is None or self._size == 0:
+            return []
+        n = self._size
+        scores = self._vectors[:n] @ vector
+        live = (self._partitions[:n] == pid) & (
+            self._created[:n] >= time.time() - self.ttl
+        )
+        scores = np.where(live, scores, -np.inf)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._values[i]) for i in top if live[i]]
+
+    def add(self, vector: np.ndarray, partition: str, value: Any) -> None:
+        pid = self._partition_ids.setdefault(partition, len(self._partition_ids))
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._created))
+        self._vectors[slot] = vector
+        self._created[slot] = time.time()
+        self._partitions[slot] = pid
+        self._values[slot] = value
+
+    def evict_expired(self) -> int:
+        """Free rows older than the TTL and return how many were dropped."""
+        n = self._size
+        expired = (self._partitions[:n] >= 0) & (
+            self._created[:n] < time.time() - self.ttl
+        )
+        for i in np.flatnonzero(expired):
+            self._values[i] = None
+        self._partitions[:n][expired] = -1
+        self._created[:n][expired] = -np.inf
+        return int(np.count_nonzero(expired))
+
+
+class SemanticCache:
+    """Embeds queries and serves stored answers above a similarity threshold."""
+
+    def __init__(
+        self,
+        client,
+        model: str = "text-embedding-3-small",
+        dim: int = 256,
+        capacity: int = 100_000,
+        ttl: float = 3600.0,
+        threshold: float = 0.95,
+    ):
+        self.client = client
+        self.model = model
+        self.threshold = threshold
+        self.index = VectorIndex(dim=dim, capacity=capacity, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        # Reduced-dimension embeddings keep the index small enough that a
+        # search over 100k rows is a few milliseconds of memory bandwidth.
+        await rate_limit.acquire(self.model)
+        resp = await self.client.embeddings.create(
+            model=self.model, input=text, dimensions=self.index.dim
+        )
+        vector = np.asarray(resp.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def lookup(
+        self, query: str, partition: str
+    ) -> tuple[Optional[Any], Optional[np.ndarray]]:
+        """Return ``(cached value or None, query embedding)``.
+
+        The embedding is handed back so a subsequent :meth:`store` does not
+        pay for a second embeddings call.
+        """
+        try:
+            vector = await self.embed(query)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {str(e)}")
+            return None, None
+        matches = self.index.search(vector, partition, k=1)
+        if matches and matches[0][0] >= self.threshold:
+            self.hits += 1
+            logger.info(f"Semantic cache hit with similarity {matches[0][0]:.3f}")
+            return matches[0][1], vector
+        self.misses += 1
+        return None, vector
+
+    def store(self, vector: np.ndarray, partition: str, value: Any) -> None:
+        if len(self.index) >= self.index.capacity:
+            self.index.evict_expired()
+        self.index.add(vector, partition, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
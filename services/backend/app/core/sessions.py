@@ -0,0 +1,160 @@
+"""Server-side conversation sessions so clients only send the newest message.
+
+Stored turns carry ``digest``, a rolling hash of the session up to and
+including that turn, and ``position``, its index in the session. Both are
+computed once when the turn is appended, so the history compactor can key
+summaries by prefix without rehashing the session on every request, and
+keep its blocks in place when old turns are trimmed.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def turn(
+    role: str,
+    content: str,
+    digest: Optional[str] = None,
+    position: Optional[int] = None,
+) -> dict:
+    if digest is None:
+        return {"role": role, "content": content}
+    return {"role": role, "content": content, "digest": digest, "position": position}
+
+
+def prefix_digest(previous: str, role: str, content: str) -> str:
+    """Digest of a conversation prefix extended by one turn ("" when empty)."""
+    data = f"{previous}\x00{role}\x00{content}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class InMemorySessionStore:
+    """Bounded LRU of sessions, each holding its most recent turns."""
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 200):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, list[dict]]" = OrderedDict()
+
+    async def get(self, session_id: str) -> list[dict]:
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            return []
+        self._sessions.move_to_end(session_id)
+        return list(turns)
+
+    async def append(self, session_id: str, turns: list[dict]) -> None:
+        stored = self._sessions.setdefault(session_id, [])
+        previous = stored[-1]["digest"] if stored else ""
+        position = stored[-1]["position"] + 1 if stored else 0
+        for t in turns:
+            previous = prefix_digest(previous, t["role"], t["content"])
+            stored.append(turn(t["role"], t["content"], previous, position))
+            position += 1
+        del stored[: -self.max_turns]
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Session store shared by worker processes through a local SQLite file.
+
+    Stands in for a network store such as Redis in multi-worker deployments.
+    """
+
+    def __init__(self, path: str, max_turns: int = 200):
+        self.path = Path(path)
+        self.max_turns = max_turns
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_turns ("
+                "session_id TEXT NOT NULL, seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL, "
+                "digest TEXT, position INTEGER)"
+            )
+            columns = {
+                row[1] for row in conn.execute("PRAGMA table_info(session_turns)")
+            }
+            for column, kind in (("digest", "TEXT"), ("position", "INTEGER")):
+                if column not in columns:
+                    conn.execute(
+                        f"ALTER TABLE session_turns ADD COLUMN {column} {kind}"
+                    )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS session_turns_by_session "
+                "ON session_turns (session_id, seq)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _get(self, session_id: str) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT role, content, digest, position FROM ("
+                "SELECT seq, role, content, digest, position FROM session_turns "
+                "WHERE session_id = ? ORDER BY seq DESC LIMIT ?) ORDER BY seq",
+                (session_id, self.max_turns),
+            ).fetchall()
+        return [turn(*row) for row in rows]
+
+    def _append(self, session_id: str, turns: list[dict]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            # Reading the previous digest and appending must not interleave
+            # with another worker's append to the same session
+            conn.execute("BEGIN IMMEDIATE")
+            last = conn.execute(
+                "SELECT digest FROM session_turns WHERE session_id = ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+            # Turns are only ever deleted with their whole session
+            (position,) = conn.execute(
+                "SELECT COUNT(*) FROM session_turns WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            # Sessions stored before digests existed stay unstamped
+            previous = "" if last is None else last[0]
+            rows = []
+            for t in turns:
+                if previous is not None:
+                    previous = prefix_digest(previous, t["role"], t["content"])
+                rows.append(
+                    (session_id, t["role"], t["content"], now, previous, position)
+                )
+                position += 1
+            conn.executemany(
+                "INSERT INTO session_turns "
+                "(session_id, role, content, created_at, digest, position) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _delete(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+
+    async def get(self, session_id: str) -> list[dict]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def append(self, session_id: str, turns: list[dict]) -> None:
+        await asyncio.to_thread(self._append, session_id, turns)
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, session_id)
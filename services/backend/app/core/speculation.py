@@ -0,0 +1,127 @@
+"""Speculative simple responses started before the classifier has decided.
+
+The responder runs in a background task whose token events are buffered.
+If the query is routed to the simple responder the task is adopted: the
+buffer is flushed to the client and the stream continues live. Otherwise it
+is cancelled and the tokens it produced are counted as waste.
+
+A speculation holds a slot of the chat model's admission gate until it is
+adopted (the request's own slot covers it from then on) or ends. It is
+only started when a slot is free, so it never queues or displaces
+admitted requests.
+"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from . import config
+from .admission import controller as admission
+from .metrics import (
+    SPECULATION_HEAD_START,
+    SPECULATION_OUTCOMES,
+    SPECULATION_WASTED_TOKENS,
+)
+from .nodes import simple_responder
+from .router import router
+from .streaming import event_sink, graph_writer
+
+
+@dataclass
+class TokenBuffer:
+    """Holds stream events until ``adopt`` names the writer they belong to."""
+
+    events: list = field(default_factory=list)
+    writer: Optional[Callable[[dict], None]] = None
+    tokens: int = 0
+
+    def __call__(self, event: dict) -> None:
+        if event.get("type") == "token":
+            self.tokens += 1
+        if self.writer is None:
+            self.events.append(event)
+        else:
+            self.writer(event)
+
+    def adopt(self, writer: Callable[[dict], None]) -> None:
+        for event in self.events:
+            writer(event)
+        self.events.clear()
+        self.writer = writer
+
+
+@dataclass
+class Speculation:
+    task: asyncio.Task
+    buffer: TokenBuffer
+    started: float
+    release: Callable[[], None]
+
+
+_running: dict[str, Speculation] = {}
+
+
+def start(state: dict[str, Any]) -> Optional[str]:
+    """Start answering ``state["query"]`` as a simple query; return its id.
+
+    Returns None without starting anything when the chat model has no free
+    admission slot.
+    """
+    gate = admission.gate(router.choose("chat", state["query"]).model)
+    if not gate.try_acquire():
+        SPECULATION_OUTCOMES.inc("saturated")
+        return None
+    started = time.perf_counter()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            gate.release(time.perf_counter() - started)
+
+    buffer = TokenBuffer()
+    # History is an immutable tuple, so the task can share it
+    inputs = {"query": state["query"], "history": state.get("history") or ()}
+
+    async def run():
+        # Set inside the task so only this task's events are buffered
+        event_sink.set(buffer)
+        return await simple_responder.respond(inputs)
+
+    speculation_id = uuid.uuid4().hex
+    task = asyncio.create_task(run())
+    task.add_done_callback(lambda task: release())
+    _running[speculation_id] = Speculation(task, buffer, started, release)
+    # Never leave an unclaimed speculation running
+    asyncio.get_running_loop().call_later(
+        config.LLM_CALL_TIMEOUT_SECONDS, cancel, speculation_id, "abandoned"
+    )
+    return speculation_id
+
+
+def cancel(speculation_id: str, outcome: str = "miss") -> None:
+    """Drop a speculation the workflow will not use and record what it cost."""
+    speculation = _running.pop(speculation_id, None)
+    if speculation is None:
+        return
+    speculation.task.cancel()
+    SPECULATION_OUTCOMES.inc(outcome)
+    SPECULATION_WASTED_TOKENS.inc(amount=speculation.buffer.tokens)
+
+
+async def adopt(speculation_id: str) -> Optional[dict]:
+    """Take over a speculation's answer, streaming its tokens from here on.
+
+    Returns None if the speculation no longer exists, in which case the
+    caller should answer normally.
+    """
+    speculation = _running.pop(speculation_id, None)
+    if speculation is None:
+        return None
+    speculation.release()
+    SPECULATION_OUTCOMES.inc("hit")
+    SPECULATION_HEAD_START.observe(time.perf_counter() - speculation.started)
+    speculation.buffer.adopt(graph_writer())
+    return await speculation.task
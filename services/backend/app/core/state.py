@@ -0,0 +1,48 @@
+"""Workflow state schemas shared by the full and simple graphs.
+
+Nodes return only the keys they change and LangGraph merges them into the
+state. The large fields are tuples, so they can't be changed in place:
+``history`` is set once when a run starts, and ``context`` only grows
+through the ``add_context`` reducer. Every node therefore reads the same
+objects, and a step costs the same whether the conversation has ten turns
+or a thousand.
+"""
+
+from typing import Annotated, Any, Iterable, TypedDict
+from .nodes.context_retriever import merge_context
+
+
+def add_context(current: tuple, update: Iterable[Any]) -> tuple:
+    """Append passages to the context, skipping ones it already holds."""
+    if not update:
+        return current or ()
+    return tuple(merge_context(current or (), update))
+
+
+class SimpleGraphState(TypedDict, total=False):
+    query: str
+    # Prior turns, oldest first; read-only for the nodes
+    history: tuple
+    response: str
+    error: str
+
+
+class GraphState(SimpleGraphState, total=False):
+    # Retrieved passages and search results, deduplicated across tools
+    context: Annotated[tuple, add_context]
+    # Retrieval tools that failed or timed out, leaving the context partial
+    tool_errors: tuple
+    # Routing flags set by the classifier
+    is_simple: bool
+    needs_web_search: bool
+    needs_doc: bool
+    wants_code: bool
+    wants_text: bool
+    generated_file: str
+    # Set when a speculative simple response is waiting to be adopted
+    speculation_id: str
+
+
+def initial_state(query: str, history: Iterable[Any] = ()) -> dict:
+    """The input of a run: the query and the conversation so far."""
+    return {"query": query, "history": tuple(history)}
@@ -0,0 +1,333 @@
+"""Token streaming helpers shared by the LLM nodes and the SSE endpoint."""
+
+import asyncio
+import functools
+import json
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+from langgraph.config import get_stream_writer
+from . import config, rate_limit
+from .metrics import (
+    LLM_CALLS,
+    LLM_COST,
+    LLM_FALLBACKS,
+    LLM_HEDGES,
+    LLM_RETRIES,
+    LLM_SECONDS,
+    LLM_TOKENS,
+    LLM_TTFT,
+)
+from .model_stats import stats_for
+from .nodes.node_logging import get_node_logger
+
+logger = get_node_logger(__name__)
+
+# Redirects events away from the graph stream, e.g. to hold back a
+# speculative answer's tokens until it is known to be the one to show
+event_sink: ContextVar[Optional[Callable[[dict], None]]] = ContextVar(
+    "event_sink", default=None
+)
+
+
+def emit(event: dict[str, Any]) -> None:
+    """Push a custom event to the graph stream, if one is being consumed.
+
+    Outside of a ``workflow.astream(..., stream_mode="custom")`` run the writer
+    is a no-op, and outside of a runnable context there is no writer at all.
+    """
+    sink = event_sink.get()
+    if sink is not None:
+        sink(event)
+        return
+    graph_writer()(event)
+
+
+def graph_writer() -> Callable[[dict], None]:
+    """Return the current graph stream writer, bypassing any event sink."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda event: None
+
+
+def emit_token(node: str, token: str) -> None:
+    """Push a single completion delta produced by ``node``."""
+    emit({"type": "token", "node": node, "token": token})
+
+
+class FirstTokenTimeout(Exception):
+    """No completion token arrived within ``LLM_FIRST_TOKEN_TIMEOUT_SECONDS``."""
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call as a whole ran past ``LLM_CALL_TIMEOUT_SECONDS``."""
+
+
+@functools.cache
+def retryable_errors() -> tuple[type[BaseException], ...]:
+    """Errors safe to retry as long as nothing has been streamed yet.
+
+    Built on first use; the provider SDK is only imported once a call is made.
+    """
+    import openai
+
+    return (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+        FirstTokenTimeout,
+    )
+
+
+async def _close(stream) -> None:
+    close = getattr(stream, "close", None)
+    if close is not None:
+        try:
+            await close()
+        except Exception:
+            pass
+
+
+async def _open_stream(client, create_kwargs: dict, rate_limited: bool = False):
+    """Start a completion and read up to its first content delta.
+
+    Takes a rate-limit slot first unless the caller already has one.
+    """
+    if not rate_limited:
+        await rate_limit.acquire(create_kwargs["model"])
+    stream = await client.chat.completions.create(stream=True, **create_kwargs)
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return stream, chunk.choices[0].delta.content
+    except BaseException:
+        await _close(stream)
+        raise
+    return stream, None
+
+
+def _discard(task: asyncio.Task) -> None:
+    """Cancel a losing request, closing its stream if it had already opened."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(_close(task.result()[0]))
+
+
+def _hedge_delay(model: str):
+    if not config.LLM_HEDGE_ENABLED:
+        return None
+    p = stats_for(model).ttft.percentile(config.LLM_HEDGE_QUANTILE)
+    if p is None:
+        return None
+    return max(p, config.LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+async def _first_token(client, node: str, create_kwargs: dict):
+    """Open the stream, hedging with a duplicate request if it is slow to start.
+
+    Whichever request yields a token first is kept and the other is
+    cancelled, so tokens are only ever emitted from one stream. The caller
+    holds the primary request's rate-limit slot; the hedge takes its own.
+    """
+    model = create_kwargs["model"]
+    delay = _hedge_delay(model)
+    primary = asyncio.create_task(_open_stream(client, create_kwargs, True))
+    pending = {primary}
+    hedge = None
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=delay if hedge is None else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                LLM_HEDGES.inc(node, model, "sent")
+                hedge = asyncio.create_task(_open_stream(client, create_kwargs))
+                pending.add(hedge)
+                continue
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        LLM_HEDGES.inc(node, model, "won")
+                    for other in done - {task}:
+                        _discard(other)
+                    return task.result()
+                error = task.exception()
+            if hedge is None and not pending:
+                break
+        raise error
+    finally:
+        for task in pending:
+            _discard(task)
+
+
+def _choose_model(node: str, model: str, fallback: Optional[str], deadline: float):
+    """Switch to the fallback once the primary's p95 no longer fits the deadline."""
+    if not fallback or fallback == model:
+        return model
+    expected = stats_for(model).duration.percentile(0.95)
+    if expected is None or deadline - time.monotonic() > expected:
+        return model
+    LLM_FALLBACKS.inc(node, model, fallback)
+    logger.warning(f"{node}: {model} p95 {expected:.1f}s exceeds deadline, using {fallback}")
+    return fallback
+
+
+def _record_usage(model: str, messages: list, completion: str, usage) -> None:
+    """Count tokens and list-price spend for a finished call."""
+    provider = config.get_provider(model)
+    if usage is not None:
+        prompt_tokens = usage.prompt_tokens
+        completion_tokens = usage.completion_tokens
+    else:
+        # Providers that don't report usage on streams get a rough estimate
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        completion_tokens = len(completion) // 4
+    LLM_TOKENS.inc(provider, model, "prompt", amount=prompt_tokens)
+    LLM_TOKENS.inc(provider, model, "completion", amount=completion_tokens)
+    price = config.MODEL_CATALOG.get(model)
+    if price is None:
+        return
+    cost = (
+        prompt_tokens * price["input_cost"] + completion_tokens * price["output_cost"]
+    ) / 1000
+    LLM_COST.inc(provider, model, amount=cost)
+    stats_for(model).cost.add(cost)
+
+
+async def _attempt(
+    client,
+    node: str,
+    create_kwargs: dict,
+    deadline: float,
+    parts: List[str],
+    on_delta: Optional[Callable[[str], None]],
+) -> str:
+    model = create_kwargs["model"]
+    stats = stats_for(model)
+    usage = None
+    # Waiting for a rate-limit slot is ours, not the provider's: it counts
+    # against the overall deadline but not the first-token timeout or TTFT
+    try:
+        await asyncio.wait_for(
+            rate_limit.acquire(model), max(deadline - time.monotonic(), 0)
+        )
+    except asyncio.TimeoutError:
+        raise LLMDeadlineExceeded(f"{node}: no rate-limit slot for {model} in time")
+    start = time.perf_counter()
+    try:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"{node}: no time left to call {model}")
+        try:
+            stream, first = await asyncio.wait_for(
+                _first_token(client, node, create_kwargs),
+                min(config.LLM_FIRST_TOKEN_TIMEOUT_SECONDS, remaining),
+            )
+        except asyncio.TimeoutError:
+            raise FirstTokenTimeout(f"{model} sent no tokens in time")
+        ttft = time.perf_counter() - start
+        LLM_TTFT.observe(ttft, node, model)
+        stats.ttft.add(ttft)
+        try:
+            async with asyncio.timeout(deadline - time.monotonic()):
+                if first:
+                    parts.append(first)
+                    emit_token(node, first)
+                    if on_delta is not None:
+                        on_delta(first)
+                async for chunk in stream:
+                    # With include_usage the last chunk has usage and no choices
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        emit_token(node, delta)
+                        if on_delta is not None:
+                            on_delta(delta)
+        except TimeoutError:
+            await _close(stream)
+            raise LLMDeadlineExceeded(
+                f"{model} did not finish within {config.LLM_CALL_TIMEOUT_SECONDS}s"
+            )
+        except BaseException:
+            await _close(stream)
+            raise
+    except Exception:
+        LLM_CALLS.inc(node, model, "error")
+        stats.errors.add(1.0)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, node, model)
+    LLM_CALLS.inc(node, model, "ok")
+    stats.errors.add(0.0)
+    stats.duration.add(time.perf_counter() - start)
+    completion = "".join(parts)
+    _record_usage(model, create_kwargs.get("messages") or [], completion, usage)
+    return completion
+
+
+async def stream_completion(
+    client,
+    node: str,
+    fallback_model: Optional[str] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    **create_kwargs,
+) -> str:
+    """Run a streaming chat completion, forwarding each delta as it arrives.
+
+    The call is bounded by ``LLM_CALL_TIMEOUT_SECONDS``. Failures before the
+    first token (connection errors, 429/5xx, a stalled first token) are
+    retried with jittered exponential backoff, switching to
+    ``fallback_model`` when the primary's p95 no longer fits in the time
+    left. Once tokens have been forwarded the call is never retried, since
+    the client has already seen them. Deltas are collected in a list and
+    joined once at the end; ``on_delta`` also receives each one as it
+    arrives, e.g. to append it to an artifact file.
+    """
+    deadline = time.monotonic() + config.LLM_CALL_TIMEOUT_SECONDS
+    primary = create_kwargs.pop("model")
+    # The fallback may be served by another provider; without a client for
+    # it there is nothing to fall back to
+    fallback_client = None
+    if fallback_model and fallback_model != primary:
+        fallback_client = config.get_client(fallback_model)
+        if fallback_client is None:
+            logger.warning(f"{node}: no client for fallback {fallback_model}")
+            fallback_model = None
+    parts: List[str] = []
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        model = _choose_model(node, primary, fallback_model, deadline)
+        kwargs = {**create_kwargs, "model": model}
+        if config.get_provider(model) == "openai":
+            kwargs["stream_options"] = {"include_usage": True}
+        model_client = client if model == primary else fallback_client
+        try:
+            return await _attempt(model_client, node, kwargs, deadline, parts, on_delta)
+        except retryable_errors() as e:
+            backoff = min(
+                config.LLM_RETRY_MAX_SECONDS, config.LLM_RETRY_BASE_SECONDS * 2**attempt
+            ) * random.uniform(0.5, 1.0)
+            if (
+                parts
+                or attempt == config.LLM_MAX_RETRIES
+                or time.monotonic() + backoff >= deadline
+            ):
+                raise
+            LLM_RETRIES.inc(node, model, type(e).__name__)
+            logger.warning(
+                f"{node}: {model} failed ({type(e).__name__}), retrying in {backoff:.2f}s"
+            )
+            await asyncio.sleep(backoff)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
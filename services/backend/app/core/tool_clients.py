@@ -0,0 +1,267 @@
+"""Long-lived, pooled MCP client sessions for the tool services."""
+
+import asyncio
+import json
+import time
+from typing import TYPE_CHECKING, Any, Optional
+from . import config
+from .metrics import TOOL_CALLS, TOOL_SECONDS
+from .nodes.node_logging import get_node_logger
+
+if TYPE_CHECKING:
+    from fastmcp import Client
+
+logger = get_node_logger(__name__)
+
+
+def decode_tool_result(result: Any) -> Any:
+    """Turn a ``call_tool`` result into the tool's JSON return value."""
+    data = getattr(result, "data", None)
+    if data is not None:
+        return data
+    for content in getattr(result, "content", result) or []:
+        text = getattr(content, "text", None)
+        if text is not None:
+            try:
+                return json.loads(text)
+            except ValueError:
+                return text
+    return None
+
+
+class ToolSession:
+    """One MCP session owned by a dedicated background task.
+
+    The MCP client runs its transport inside an anyio task group, which must
+    be entered and exited by the same task. Owning the session in its own
+    task lets request handlers share it and lets reconnects happen from any
+    task without cancel-scope errors.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client: Optional["Client"] = None
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and self.client.is_connected()
+
+    async def open(self, timeout: float) -> None:
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except BaseException:
+            # A slow service must not leave a connection attempt behind
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            raise
+        if self.client is None:
+            raise ConnectionError(f"Could not connect to {self.url}: {self.error}")
+
+    async def _run(self) -> None:
+        # Imported here so workflows without tools never load the MCP SDK
+        from fastmcp import Client
+
+        try:
+            async with Client(self.url) as client:
+                self.client = client
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.client = None
+            self._ready.set()
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, 5.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+
+class ToolSessionPool:
+    """A fixed number of sessions to one tool service, used round-robin.
+
+    MCP sessions multiplex concurrent requests, so sessions are shared rather
+    than checked out; a semaphore caps the calls in flight to the service.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        size: int = 2,
+        max_in_flight: int = 16,
+        call_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+    ):
+        self.name = name
+        self.url = url
+        self.size = size
+        self.call_timeout = call_timeout
+        self.connect_timeout = connect_timeout
+        self.sessions: list[ToolSession] = []
+        self._limit = asyncio.Semaphore(max_in_flight)
+        self._lock = asyncio.Lock()
+        self._next = 0
+        self.calls = 0
+        self.failures = 0
+        self.reconnects = 0
+
+    async def _connect(self) -> ToolSession:
+        session = ToolSession(self.url)
+        await session.open(self.connect_timeout)
+        return session
+
+    async def start(self) -> None:
+        async with self._lock:
+            while len(self.sessions) < self.size:
+                self.sessions.append(await self._connect())
+        logger.info(f"Opened {len(self.sessions)} sessions to {self.name}")
+
+    async def _replace(self, index: int, force: bool = False) -> ToolSession:
+        async with self._lock:
+            session = self.sessions[index]
+            if session.alive and not force:
+                return session
+            await session.close()
+            logger.warning(f"Reconnecting session {index} to {self.name}")
+            self.sessions[index] = await self._connect()
+            self.reconnects += 1
+            return self.sessions[index]
+
+    async def _pick(self) -> tuple[int, ToolSession]:
+        if len(self.sessions) < self.size:
+            await self.start()
+        index = self._next % len(self.sessions)
+        self._next += 1
+        session = self.sessions[index]
+        if not session.alive:
+            session = await self._replace(index)
+        return index, session
+
+    async def call(self, tool: str, arguments: dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await self._call(tool, arguments)
+        except Exception:
+            TOOL_CALLS.inc(self.name, tool, "error")
+            raise
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - start, self.name, tool)
+        TOOL_CALLS.inc(self.name, tool, "ok")
+        return result
+
+    async def _call(self, tool: str, arguments: dict[str, Any]) -> Any:
+        async with self._limit:
+            self.calls += 1
+            index, session = await self._pick()
+            try:
+                result = await session.client.call_tool(
+                    tool, arguments, timeout=self.call_timeout
+                )
+            except Exception:
+                if session.alive:
+                    self.failures += 1
+                    raise
+                # The session dropped under us; tool calls are idempotent
+                # lookups, so retry once on a fresh session
+                session = await self._replace(index)
+                try:
+                    result = await session.client.call_tool(
+                        tool, arguments, timeout=self.call_timeout
+                    )
+                except Exception:
+                    self.failures += 1
+                    raise
+        return decode_tool_result(result)
+
+    async def health_check(self) -> None:
+        for index, session in enumerate(list(self.sessions)):
+            try:
+                if not session.alive:
+                    raise ConnectionError("session closed")
+                await asyncio.wait_for(session.client.ping(), self.connect_timeout)
+            except Exception as e:
+                logger.warning(f"Health check failed for {self.name}[{index}]: {e}")
+                try:
+                    await self._replace(index, force=True)
+                except Exception as e:
+                    logger.error(f"Could not reconnect to {self.name}: {str(e)}")
+
+    async def close(self) -> None:
+        async with self._lock:
+            await asyncio.gather(*(s.close() for s in self.sessions))
+            self.sessions = []
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "alive": sum(s.alive for s in self.sessions),
+            "calls": self.calls,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+        }
+
+
+class ToolClientManager:
+    """Owns one session pool per tool service for the lifetime of the app."""
+
+    def __init__(
+        self, services: dict[str, str], health_interval: float = 30.0, **pool_kwargs
+    ):
+        self.pools = {
+            name: ToolSessionPool(name, url, **pool_kwargs)
+            for name, url in services.items()
+        }
+        self.health_interval = health_interval
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Open all pools; unreachable services are retried on first use."""
+        results = await asyncio.gather(
+            *(pool.start() for pool in self.pools.values()), return_exceptions=True
+        )
+        for name, result in zip(self.pools, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Tool service {name} unavailable at startup: {result}")
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for pool in self.pools.values():
+                if pool.sessions:
+                    await pool.health_check()
+
+    async def call(self, service: str, tool: str, arguments: dict[str, Any]) -> Any:
+        return await self.pools[service].call(tool, arguments)
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+tool_clients = ToolClientManager(
+    {
+        "web_search": config.WEB_SEARCH_TOOL_URL,
+        "docs_retriever": config.DOCS_RETRIEVER_TOOL_URL,
+    },
+    health_interval=config.TOOL_HEALTH_CHECK_INTERVAL_SECONDS,
+    size=config.TOOL_POOL_SIZE,
+    max_in_flight=config.TOOL_MAX_IN_FLIGHT,
+    call_timeout=config.TOOL_CALL_TIMEOUT_SECONDS,
+)
@@ -1,18 +1,37 @@
+import asyncio
+import json
 import logging
+import mimetypes
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from enum import Enum
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from .core.graph import build_graph
-from .core.graph_simple import build_simple_graph
+from .core import artifacts, checkpoints, config
+from .core.admission import BATCH, INTERACTIVE, Overloaded
+from .core.admission import controller as admission
+from .core.cache import ResponseCache, SQLiteCacheBackend, make_cache_key
+from .core.context_packing import compactor, warm_tokenizers
+from .core.lifecycle import Warmup
+from .core.model_stats import all_stats
+from .core.query_classifier import classifier
+from .core.router import Route, pinned_route, router
+from .core.metrics import BATCH_ITEMS, REGISTRY, REQUEST_SECONDS, gauge
+from .core.sessions import InMemorySessionStore, SQLiteSessionStore, turn
+from .core.state import initial_state
+from .core.streaming import format_sse
+from .core.tool_clients import tool_clients
 
-# Configure logging
+# Configure logging; DEBUG formats full workflow state and is meant for local runs
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Augmented‑LLM Router")
-
 
 class WorkflowType(str, Enum):
     """Available workflow types for the LLM router."""
@@ -25,9 +44,65 @@ class WorkflowType(str, Enum):
     # etc...
 
 
-# For easy workflow switching during development
-# ACTIVE_WORKFLOW = WorkflowType.FULL
-ACTIVE_WORKFLOW = WorkflowType.SIMPLE
+# For easy workflow switching during development; ACTIVE_WORKFLOW=full in
+# the environment selects the full graph (the load harness runs both)
+ACTIVE_WORKFLOW = WorkflowType(os.environ.get("ACTIVE_WORKFLOW", "simple"))
+
+
+# Compiled once per worker by the warm-up in ``lifespan``, not at import
+workflow = None
+# Holds a provider client, so it is also created by the warm-up
+semantic_cache = None
+warmup = Warmup()
+
+
+async def compile_workflow() -> None:
+    global workflow
+    workflow = await asyncio.to_thread(get_workflow, ACTIVE_WORKFLOW)
+
+
+def warmup_steps() -> list:
+    steps = [
+        ("workflow", compile_workflow),
+        ("provider_clients", lambda: asyncio.to_thread(config.warm_clients)),
+        # Tokenizer files may be fetched on first use; keep that off the request path
+        ("tokenizers", lambda: asyncio.to_thread(warm_tokenizers)),
+    ]
+    if config.SEMANTIC_CACHE_ENABLED:
+        steps.append(("semantic_cache", open_semantic_cache))
+    # Open tool sessions up front so requests never pay for the MCP handshake
+    if ACTIVE_WORKFLOW == WorkflowType.FULL:
+        steps.append(("tool_sessions", tool_clients.start))
+    return steps
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the worker answers liveness probes at once;
+    # readiness turns true when the warm-up is done
+    warming = asyncio.create_task(warmup.run(warmup_steps()))
+    sweepers = [asyncio.create_task(artifacts.retention_loop())]
+    if checkpoint_store is not None:
+        sweepers.append(asyncio.create_task(checkpoints.sweep_loop(checkpoint_store)))
+    yield
+    warming.cancel()
+    for sweeper in sweepers:
+        sweeper.cancel()
+    await tool_clients.close()
+
+
+async def ready_workflow():
+    """The compiled workflow, waiting briefly for this worker's warm-up."""
+    if workflow is None and not await warmup.wait(config.WARMUP_WAIT_SECONDS):
+        raise HTTPException(
+            503,
+            warmup.error or "Worker is warming up",
+            headers={"Retry-After": "1"},
+        )
+    return workflow
+
+
+app = FastAPI(title="Augmented‑LLM Router", lifespan=lifespan)
 
 
 # Define the message model
@@ -35,15 +110,26 @@ class Message(BaseModel):
     id: str
     content: str
     history: list[str] = []
+    # Conversation to continue; its stored turns are prepended to ``history``
+    session_id: str | None = None
+    # Give up if the request is still queued for admission after this long
+    deadline_seconds: float | None = None
+    # Skip the response cache for this request (lookup and store)
+    bypass_cache: bool = False
 
 
-# Initialize workflow
+# Initialize workflow. Graph modules are imported here so the inactive
+# workflow's nodes and their clients are never loaded.
 def get_workflow(workflow_type: WorkflowType):
     """Get the appropriate workflow based on type."""
     match workflow_type:
         case WorkflowType.FULL:
+            from .core.graph import build_graph
+
             return build_graph()
         case WorkflowType.SIMPLE:
+            from .core.graph_simple import build_simple_graph
+
             return build_simple_graph()
         # Add new workflow types here as they are implemented
         # case WorkflowType.SEMANTIC:
@@ -54,44 +140,530 @@ def get_workflow(workflow_type: WorkflowType):
             logger.warning(
                 f"Unknown workflow type {workflow_type}, falling back to FULL"
             )
+            from .core.graph import build_graph
+
             return build_graph()
 
 
-workflow = get_workflow(ACTIVE_WORKFLOW)
+response_cache = ResponseCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=config.RESPONSE_CACHE_TTL_SECONDS,
+    backend=(
+        SQLiteCacheBackend(config.RESPONSE_CACHE_PATH)
+        if config.RESPONSE_CACHE_PATH
+        else None
+    ),
+)
+
+
+def build_semantic_cache():
+    """The semantic cache if enabled; NumPy is only imported when it is."""
+    if not (config.SEMANTIC_CACHE_ENABLED and config.openai_client):
+        return None
+    from .core.semantic_cache import SemanticCache
+
+    return SemanticCache(
+        config.openai_client,
+        model=config.SEMANTIC_CACHE_MODEL,
+        dim=config.SEMANTIC_CACHE_DIM,
+        capacity=config.SEMANTIC_CACHE_CAPACITY,
+        ttl=config.SEMANTIC_CACHE_TTL_SECONDS,
+        threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    )
+
+
+async def open_semantic_cache() -> None:
+    global semantic_cache
+    semantic_cache = build_semantic_cache()
+
+
+session_store = (
+    SQLiteSessionStore(config.SESSION_STORE_PATH, max_turns=config.SESSION_MAX_TURNS)
+    if config.SESSION_STORE_PATH
+    else InMemorySessionStore(
+        max_sessions=config.SESSION_MAX_SESSIONS, max_turns=config.SESSION_MAX_TURNS
+    )
+)
+
+
+checkpoint_store = (
+    checkpoints.CheckpointStore(
+        config.CHECKPOINT_PATH, ttl=config.CHECKPOINT_TTL_SECONDS
+    )
+    if config.CHECKPOINT_PATH
+    else None
+)
+
+
+async def open_run(msg: Message) -> checkpoints.RunCheckpoint | None:
+    """Start or resume the checkpointed run for this message id, if enabled.
+
+    The fingerprint covers the request body, not the stored session turns,
+    so a retry after a completed run still matches once the exchange has
+    been recorded.
+    """
+    if checkpoint_store is None:
+        return None
+    return await checkpoint_store.open(
+        msg.id,
+        checkpoints.fingerprint(
+            msg.content, msg.history, msg.session_id, ACTIVE_WORKFLOW.value
+        ),
+    )
+
+
+async def load_history(msg: Message) -> list:
+    """Return the stored session turns followed by any history sent inline."""
+    if msg.session_id is None:
+        return msg.history
+    return await session_store.get(msg.session_id) + msg.history
+
+
+async def record_turns(msg: Message, response: dict) -> None:
+    """Append the exchange to the session so the client never resends it."""
+    if msg.session_id is None:
+        return
+    await session_store.append(
+        msg.session_id,
+        [turn("user", msg.content), turn("assistant", response["response"])],
+    )
+
+
+@dataclass
+class CacheHandle:
+    """Where a response computed for a request should be stored."""
+
+    key: str | None = None
+    partition: str | None = None
+    vector: object = None
+
+
+def cache_key_for(msg: Message, history: list) -> str | None:
+    """Return the response cache key for a request, or None when not cacheable."""
+    if not config.RESPONSE_CACHE_ENABLED or msg.bypass_cache:
+        return None
+    return make_cache_key(
+        msg.content, history, ACTIVE_WORKFLOW.value, config.MODEL_CONFIG
+    )
+
+
+def route_task(query: str) -> tuple[str, dict]:
+    """Return the task (and classifier flags) the active workflow will run.
+
+    Computed once per request for the cache and admission. The classifier
+    is called directly, not through the graph node, so these calls stay out
+    of the node metrics and logs.
+    """
+    flags = classifier.classify(query)
+    if ACTIVE_WORKFLOW == WorkflowType.SIMPLE or flags.get("is_simple"):
+        return "chat", flags
+    return ("code" if flags.get("wants_code") else "text"), flags
+
+
+def semantic_partition(task: str, flags: dict, history: list) -> str | None:
+    """Return the semantic cache partition for a request.
+
+    Paraphrases only share answers within the same workflow, task, model and
+    history. Time-sensitive queries that need a web search are never cached.
+    """
+    if flags.get("needs_web_search"):
+        return None
+    # The task name stands in for the query so the key covers everything else
+    return make_cache_key(
+        task, history, ACTIVE_WORKFLOW.value, config.get_model_config(task)
+    )
+
+
+async def lookup_cache(
+    msg: Message, history: list, task: str, flags: dict
+) -> tuple[dict | None, CacheHandle]:
+    """Check the exact-match cache, then the semantic cache."""
+    handle = CacheHandle(key=cache_key_for(msg, history))
+    if handle.key is not None:
+        cached = await response_cache.get(handle.key)
+        if cached is not None:
+            return cached, handle
+    if semantic_cache is not None and not msg.bypass_cache:
+        handle.partition = semantic_partition(task, flags, history)
+        if handle.partition is not None:
+            cached, handle.vector = await semantic_cache.lookup(
+                msg.content, handle.partition
+            )
+            if cached is not None:
+                if handle.key is not None:
+                    await response_cache.set(handle.key, cached)
+                return cached, handle
+    return None, handle
+
+
+async def store_cache(handle: CacheHandle, result: dict, response: dict) -> None:
+    """Store a freshly computed response unless the workflow reported an error."""
+    if result.get("error"):
+        return
+    if handle.key is not None:
+        await response_cache.set(handle.key, response)
+    if handle.vector is not None:
+        semantic_cache.store(handle.vector, handle.partition, response)
+
+
+def admission_route(task: str, query: str) -> Route:
+    """Choose the route the run will use; its model's slots are occupied.
+
+    The route is pinned for the run (``pinned_route``), so the nodes call
+    the model that was admitted rather than choosing again.
+    """
+    return router.choose(task, query)
+
+
+def admission_deadline(msg: Message, priority: int) -> float:
+    default = (
+        config.BATCH_DEADLINE_SECONDS
+        if priority == BATCH
+        else config.ADMISSION_DEADLINE_SECONDS
+    )
+    return time.monotonic() + (msg.deadline_seconds or default)
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    """429 when the queue is full, 503 when the request expired while queued."""
+    return HTTPException(
+        429 if e.reason == "queue_full" else 503,
+        str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def extract_response(result: dict) -> dict:
+    """Build the client payload from the final workflow state."""
+    response = _response_payload(result)
+    # Nodes report failures in-band; surface them so callers can tell
+    if result.get("error"):
+        response["error"] = result["error"]
+    if result.get("generated_file"):
+        response["artifact"] = artifacts.url_for(result["generated_file"])
+    return response
+
+
+def _response_payload(result: dict) -> dict:
+    # Return the answer or response from the workflow
+    if "answer" in result:
+        logger.info("Sending answer response")
+        return {"response": result["answer"]}
+    if "response" in result:
+        logger.info("Sending direct response")
+        return {"response": result["response"]}
+    logger.warning("No response or answer found in result")
+    return {"response": "No response generated"}
+
+
+CACHE_STATS = gauge(
+    "llmflow_cache_stats", "Response cache counters", ("cache", "stat")
+)
+TOOL_POOL_STATS = gauge(
+    "llmflow_tool_pool_stats", "MCP session pool counters", ("service", "stat")
+)
+ADMISSION_STATS = gauge(
+    "llmflow_admission_stats",
+    "Slots in use, limit and queue depth per model",
+    ("model", "stat"),
+)
+
+
+def collect_component_stats() -> None:
+    """Copy cache and tool pool counters into gauges at scrape time."""
+    caches = {"exact": response_cache.stats()}
+    if semantic_cache is not None:
+        caches["semantic"] = semantic_cache.stats()
+    for cache_name, stats in caches.items():
+        for stat, value in stats.items():
+            CACHE_STATS.set(value, cache_name, stat)
+    for service, stats in tool_clients.stats().items():
+        for stat, value in stats.items():
+            TOOL_POOL_STATS.set(value, service, stat)
+    for model, stats in admission.stats().items():
+        for stat, value in stats.items():
+            ADMISSION_STATS.set(value, model, stat)
+
+
+REGISTRY.collectors.append(collect_component_stats)
 
 
 @app.post("/chat")
 async def chat(msg: Message):
     logger.info(f"Received chat request with id: {msg.id}")
-    logger.debug(f"Message content: {msg.content}")
-    logger.debug(f"History length: {len(msg.history)}")
+    start = time.perf_counter()
+    try:
+        return await run_chat(msg)
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, "chat")
+
 
-    state = {"query": msg.content, "history": msg.history}
+async def run_chat(msg: Message, priority: int = INTERACTIVE) -> dict:
+    run = await open_run(msg)
+    if run is not None and run.result is not None:
+        # A retry of a request that already completed
+        logger.info(f"Returning the stored result of run {msg.id}")
+        return run.result
+    task, flags = route_task(msg.content)
+    history = await load_history(msg)
+    logger.debug("History length: %d", len(history))
+    cached, cache_handle = await lookup_cache(msg, history, task, flags)
+    if cached is not None:
+        logger.info("Serving response from cache")
+        await record_turns(msg, cached)
+        if run is not None:
+            await run.finish(cached)
+        return cached
+
+    state = initial_state(msg.content, history)
+    compiled = await ready_workflow()
+    route = admission_route(task, msg.content)
+    # Nodes the run already completed are replayed from their checkpoints
+    token = checkpoints.current_run.set(run)
+    route_token = pinned_route.set(route)
     try:
-        logger.info("Invoking workflow")
-        result = await workflow.ainvoke(state)
+        async with admission.admit(
+            route.model, priority, admission_deadline(msg, priority)
+        ):
+            logger.info("Invoking workflow")
+            result = await compiled.ainvoke(state)
         logger.info("Workflow completed successfully")
-        logger.debug(f"Workflow result keys: {result.keys()}")
-        logger.debug(f"Workflow result full: {result}")
-
-        # Return the answer or response from the workflow
-        if "answer" in result:
-            response = {"response": result["answer"]}
-            logger.info("Sending answer response")
-        elif "response" in result:
-            response = {"response": result["response"]}
-            logger.info("Sending direct response")
-        else:
-            response = {"response": "No response generated"}
-            logger.warning("No response or answer found in result")
-
-        logger.debug(f"Final response: {response}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Workflow result full: %s", result)
+
+        response = extract_response(result)
+        await store_cache(cache_handle, result, response)
+        if not result.get("error"):
+            await record_turns(msg, response)
+            if run is not None:
+                await run.finish(response)
         return response
+    except Overloaded as e:
+        logger.warning(f"Shedding request {msg.id}: {str(e)}")
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         raise HTTPException(500, str(e))
+    finally:
+        checkpoints.current_run.reset(token)
+        pinned_route.reset(route_token)
+
+
+@app.post("/chat/batch")
+async def chat_batch(msgs: list[Message]):
+    """Run many messages concurrently and stream results back as NDJSON.
+
+    Each line is ``{"index", "id", "response"}`` or ``{"index", "id",
+    "error"}`` and is written as soon as that item finishes, so one slow item
+    never holds back the rest and one failure never fails the batch. At most
+    ``BATCH_MAX_CONCURRENCY`` items run at once; LLM calls also respect the
+    per-provider rate limits.
+    """
+    if len(msgs) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            413, f"Batch of {len(msgs)} exceeds {config.BATCH_MAX_ITEMS} items"
+        )
+    logger.info(f"Received batch of {len(msgs)} chat requests")
+    semaphore = asyncio.Semaphore(config.BATCH_MAX_CONCURRENCY)
+
+    async def run_item(index: int, msg: Message) -> dict:
+        item = {"index": index, "id": msg.id}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                item.update(await run_chat(msg, BATCH))
+            except HTTPException as e:
+                item["error"] = e.detail
+                if e.headers and "Retry-After" in e.headers:
+                    item["retry_after"] = int(e.headers["Retry-After"])
+            except Exception as e:
+                logger.error(f"Batch item {msg.id} failed: {str(e)}", exc_info=True)
+                item["error"] = str(e)
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_batch_item")
+        BATCH_ITEMS.inc("error" if "error" in item else "ok")
+        return item
+
+    async def lines():
+        tasks = [asyncio.create_task(run_item(i, m)) for i, m in enumerate(msgs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, default=str) + "\n"
+        finally:
+            # Client went away: don't keep spending tokens on the rest
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/chat/stream")
+async def chat_stream(msg: Message):
+    """Stream the workflow run as Server-Sent Events.
+
+    Emits ``token`` events for every completion delta produced by the LLM
+    nodes, a ``node`` event whenever a graph node finishes, and a final
+    ``done`` event carrying the same payload as ``/chat``.
+    """
+    logger.info(f"Received streaming chat request with id: {msg.id}")
+    compiled = await ready_workflow()
+    task, flags = route_task(msg.content)
+    route = admission_route(task, msg.content)
+    model = route.model
+    # Reject before the 200 and the event stream have been sent
+    try:
+        admission.check(model)
+    except Overloaded as e:
+        raise overloaded_error(e)
+
+    async def event_source():
+        final_state: dict = {}
+        start = time.perf_counter()
+        try:
+            run = await open_run(msg)
+            if run is not None and run.result is not None:
+                logger.info(f"Returning the stored result of run {msg.id}")
+                yield format_sse("done", run.result)
+                return
+            history = await load_history(msg)
+            cached, cache_handle = await lookup_cache(msg, history, task, flags)
+            if cached is not None:
+                logger.info("Serving streamed response from cache")
+                await record_turns(msg, cached)
+                if run is not None:
+                    await run.finish(cached)
+                yield format_sse("done", cached)
+                return
+            state = initial_state(msg.content, history)
+            # Set for the rest of this generator's task; its nodes inherit them
+            checkpoints.current_run.set(run)
+            pinned_route.set(route)
+            async with admission.admit(
+                model, INTERACTIVE, admission_deadline(msg, INTERACTIVE)
+            ):
+                async for mode, chunk in compiled.astream(
+                    state, stream_mode=["custom", "updates", "values"]
+                ):
+                    if mode == "custom":
+                        yield format_sse(chunk.get("type", "token"), chunk)
+                    elif mode == "updates":
+                        for node in chunk:
+                            yield format_sse("node", {"node": node})
+                    else:
+                        final_state = chunk
+            response = extract_response(final_state)
+            await store_cache(cache_handle, final_state, response)
+            if not final_state.get("error"):
+                await record_turns(msg, response)
+                if run is not None:
+                    await run.finish(response)
+            yield format_sse("done", response)
+        except Overloaded as e:
+            logger.warning(f"Shedding streaming request {msg.id}: {str(e)}")
+            yield format_sse(
+                "error", {"detail": str(e), "retry_after": e.retry_after}
+            )
+        except Exception as e:
+            logger.error(f"Error streaming request: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, "chat_stream")
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/artifacts/{name}")
+async def download_artifact(name: str, request: Request):
+    """Serve a generated file, following it while it is still being written."""
+    accept_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    opened = await artifacts.open_reader(name, accept_gzip)
+    if opened is None:
+        raise HTTPException(404, "Artifact not found")
+    chunks, headers = opened
+    media_type = mimetypes.guess_type(name)[0] or "text/plain"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    turns = await session_store.get(session_id)
+    return {
+        "session_id": session_id,
+        "turns": [turn(t["role"], t["content"]) for t in turns],
+    }
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    await session_store.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = {"exact": response_cache.stats()}
+    if semantic_cache is not None:
+        stats["semantic"] = semantic_cache.stats()
+    stats["history_summaries"] = compactor.stats()
+    return stats
+
+
+@app.get("/checkpoints/stats")
+async def checkpoint_stats():
+    if checkpoint_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **await checkpoint_store.stats()}
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+
+@app.get("/router/stats")
+async def router_stats():
+    """Rolling latency, error rate and cost per model behind routing decisions."""
+    return {
+        "policy": router.policy,
+        "models": {
+            model: {"provider": config.get_provider(model), **stats.summary()}
+            for model, stats in all_stats().items()
+        },
+    }
+
+
+@app.get("/tools/stats")
+async def tool_stats():
+    return tool_clients.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-node spans, LLM/tool call counters and cache stats for Prometheus."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the worker's event loop is answering."""
     return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: 200 once this worker's warm-up has finished, 503 before.
+
+    The body reports warm-up step timings, time from process start to
+    ready, and the worker's RSS/PSS.
+    """
+    report = warmup.report()
+    if not report["ready"]:
+        return JSONResponse(report, status_code=503)
+    return report
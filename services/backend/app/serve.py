@@ -0,0 +1,226 @@
+"""Pre-forked multi-worker serving mode.
+
+The master process imports the application once, binds the listening socket
+and forks the workers. Every module imported before the fork is shared
+copy-on-write, and ``gc.freeze`` keeps the collector from touching (and so
+copying) those pages. That covers FastAPI, LangGraph, the active workflow's
+nodes, the provider SDK and the tokenizer. Each worker then only runs its
+own warm-up: compiling the workflow, creating provider clients and opening
+tool sessions. Those hold connections and locks, so they must not be
+created before the fork.
+
+Workers report startup time and memory to the master when they become
+ready, and the master logs a summary. A worker that dies is replaced.
+
+Any worker may serve any turn of a conversation, so with more than one
+worker the session store, run checkpoints and response cache default to
+SQLite files under ``--state-dir`` that every worker opens (variables that
+are set explicitly win). The rest stays per worker:
+- the in-memory tier of the response cache and the semantic cache;
+- admission limits and queues (``ADMISSION_*``) and provider rate limits,
+  so the deployment admits up to ``workers`` times each limit;
+- the router's model statistics, speculation and ``/metrics``.
+
+Usage:
+    python -m app.serve [--workers 4] [--host 0.0.0.0] [--port 8000]
+        [--state-dir /var/lib/llmflow]
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("serve")
+
+# Stores that keep their state in the process unless given a file
+SHARED_STATE = {
+    "SESSION_STORE_PATH": "sessions.db",
+    "CHECKPOINT_PATH": "checkpoints.db",
+    "RESPONSE_CACHE_PATH": "responses.db",
+}
+
+
+def share_state(directory: str) -> None:
+    """Point the per-process stores at files in ``directory``.
+
+    Must run before ``preload``, since the config reads them at import.
+    """
+    for name, filename in SHARED_STATE.items():
+        if not os.environ.get(name):
+            os.environ[name] = os.path.join(directory, filename)
+
+
+def preload() -> None:
+    """Import what every worker needs without creating any connections."""
+    from .core.context_packing import warm_tokenizers
+
+    importlib.import_module("uvicorn")
+    main = importlib.import_module("app.main")
+    graph_module = {
+        main.WorkflowType.FULL: "app.core.graph",
+        main.WorkflowType.SIMPLE: "app.core.graph_simple",
+    }.get(main.ACTIVE_WORKFLOW, "app.core.graph")
+    importlib.import_module(graph_module)
+    if os.environ.get("OPENAI_API_KEY") or os.environ.get("ANTHROPIC_API_KEY"):
+        importlib.import_module("openai")
+    if main.ACTIVE_WORKFLOW == main.WorkflowType.FULL:
+        importlib.import_module("fastmcp")
+    # Tokenizer tables are large and read-only: load them once for all workers
+    warm_tokenizers()
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, report_fd: int, log_level: str) -> None:
+    import uvicorn
+    from .core import lifecycle
+    from .main import app
+
+    lifecycle.started_at = time.time()
+    lifecycle.report_fd = report_fd
+    # Drop the master's handlers; uvicorn installs its own for a graceful
+    # shutdown on SIGTERM, and SIGINT is left to the master to relay
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, sock: socket.socket, workers: int, log_level: str):
+        self.sock = sock
+        self.size = workers
+        self.log_level = log_level
+        self.workers: dict[int, float] = {}  # pid -> fork time
+        self.reports: dict[int, dict] = {}
+        self.stopping = False
+        self.started = time.time()
+        self.read_fd, self.write_fd = os.pipe()
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            os.close(self.read_fd)
+            try:
+                run_worker(self.sock, self.write_fd, self.log_level)
+            finally:
+                os._exit(0)
+        self.workers[pid] = time.time()
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _read_reports(self, buffer: bytes) -> bytes:
+        ready, _, _ = select.select([self.read_fd], [], [], 0.5)
+        if not ready:
+            return buffer
+        buffer += os.read(self.read_fd, 65536)
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            report = json.loads(line)
+            self.reports[report["pid"]] = report
+            if len(self.reports) == self.size:
+                self.log_startup()
+        return buffer
+
+    def log_startup(self) -> None:
+        reports = list(self.reports.values())
+        ready_after = max(r["ready_after_seconds"] for r in reports)
+        logger.info(
+            f"{len(reports)} workers ready {time.time() - self.started:.2f}s after "
+            f"fork (slowest warm-up {ready_after:.2f}s)"
+        )
+        for r in sorted(reports, key=lambda r: r["pid"]):
+            pss = "-" if r["pss_mb"] is None else f"{r['pss_mb']:.0f}"
+            logger.info(
+                f"  worker {r['pid']}: ready in {r['ready_after_seconds']:.2f}s, "
+                f"RSS {r['rss_mb']:.0f} MiB, PSS {pss} MiB, "
+                f"steps {json.dumps({k: round(v, 3) for k, v in r['steps'].items()})}"
+            )
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.size):
+            self.spawn()
+        buffer = b""
+        while self.workers:
+            buffer = self._read_reports(buffer)
+            while True:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    return
+                if pid == 0:
+                    break
+                forked = self.workers.pop(pid, None)
+                self.reports.pop(pid, None)
+                if self.stopping or forked is None:
+                    continue
+                logger.warning(
+                    f"Worker {pid} exited with status {status}, starting a new one"
+                )
+                # Don't spin if workers die during startup
+                if time.time() - forked < 1:
+                    time.sleep(1)
+                self.spawn()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--state-dir",
+        default=os.environ.get(
+            "STATE_DIR", os.path.join(tempfile.gettempdir(), "llmflow")
+        ),
+        help="Where workers share sessions, checkpoints and cached responses",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        share_state(args.state_dir)
+    start = time.perf_counter()
+    preload()
+    # Everything loaded so far is long-lived; keep the collector off those
+    # pages so workers share them instead of copying them
+    gc.freeze()
+    logger.info(
+        f"Preloaded application in {time.perf_counter() - start:.2f}s; "
+        f"starting {args.workers} workers on {args.host}:{args.port}"
+    )
+    sock = bind(args.host, args.port)
+    Master(sock, args.workers, args.log_level).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,5 +15,9 @@ if [ ! -f ".venv_backend/installed" ]; then
     touch .venv_backend/installed
 fi
 
-# Run the service
-uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
+# Run the service; WORKERS>1 serves with pre-forked workers instead of --reload
+if [ "${WORKERS:-1}" -gt 1 ]; then
+    python -m app.serve --workers "$WORKERS" --host 0.0.0.0 --port 8000
+else
+    uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
+fi
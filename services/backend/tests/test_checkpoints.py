@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from app.core import checkpoints, graph
+from app.core.nodes import (
+    classify_query,
+    context_retriever,
+    text_generator,
+    web_search_trigger,
+)
+from app.core.state import initial_state
+
+RESULT = {"url": "https://example.com/news", "title": "News"}
+
+
+def test_retry_refetches_context_a_timed_out_tool_left_out(tmp_path, monkeypatch):
+    store = checkpoints.CheckpointStore(str(tmp_path / "runs.db"))
+    searches = []
+    generated = []
+
+    def classify(state):
+        return {"is_simple": False, "needs_web_search": True, "wants_text": True}
+
+    async def fetch_search(state):
+        searches.append(state["query"])
+        if len(searches) == 1:
+            await asyncio.sleep(1.0)
+        return {"context": [RESULT]}
+
+    async def gen_text(state):
+        generated.append(state.get("context"))
+        if len(generated) == 1:
+            raise RuntimeError("provider down")
+        return {"response": "report"}
+
+    monkeypatch.setattr(classify_query, "classify", classify)
+    monkeypatch.setattr(context_retriever, "WEB_SEARCH_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(web_search_trigger, "fetch_search", fetch_search)
+    monkeypatch.setattr(text_generator, "gen_text", gen_text)
+    workflow = graph.build_graph(speculative=False)
+
+    async def attempt():
+        run = await store.open("req-1", checkpoints.fingerprint("latest news"))
+        token = checkpoints.current_run.set(run)
+        try:
+            return await workflow.ainvoke(initial_state("latest news"))
+        finally:
+            checkpoints.current_run.reset(token)
+
+    # The search times out, then generation fails on the partial context
+    with pytest.raises(RuntimeError):
+        asyncio.run(attempt())
+    assert generated == [()]
+
+    result = asyncio.run(attempt())
+    assert len(searches) == 2
+    assert generated[-1] == (RESULT,)
+    assert result["response"] == "report"
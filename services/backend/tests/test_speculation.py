@@ -0,0 +1,62 @@
+import asyncio
+from app.core import graph, speculation
+from app.core.admission import controller as admission
+from app.core.nodes import classify_query, simple_responder
+from app.core.router import router
+from app.core.state import initial_state
+from app.core.streaming import emit_token
+
+
+def simple(state):
+    return {"is_simple": True}
+
+
+def chat_gate():
+    return admission.gate(router.choose("chat", "hi").model)
+
+
+def test_speculation_streams_before_the_responder_adopts_it(monkeypatch):
+    tokens_at_adoption = []
+    adopt = speculation.adopt
+
+    async def respond(state):
+        for token in ("Hel", "lo"):
+            emit_token("simple_responder", token)
+            await asyncio.sleep(0)
+        return {"response": "Hello"}
+
+    async def adopt_and_record(speculation_id):
+        running = speculation._running[speculation_id]
+        tokens_at_adoption.append(running.buffer.tokens)
+        return await adopt(speculation_id)
+
+    monkeypatch.setattr(simple_responder, "respond", respond)
+    monkeypatch.setattr(classify_query, "classify", simple)
+    monkeypatch.setattr(speculation, "adopt", adopt_and_record)
+    workflow = graph.build_graph(speculative=True)
+
+    result = asyncio.run(workflow.ainvoke(initial_state("hi")))
+    assert result["response"] == "Hello"
+    assert tokens_at_adoption[0] > 0
+    assert chat_gate().in_flight == 0
+
+
+def test_no_speculation_without_a_free_admission_slot(monkeypatch):
+    started = []
+
+    async def respond(state):
+        started.append(state["query"])
+        return {"response": "Hello"}
+
+    gate = chat_gate()
+    monkeypatch.setattr(gate, "in_flight", gate.limit)
+    monkeypatch.setattr(simple_responder, "respond", respond)
+    monkeypatch.setattr(classify_query, "classify", simple)
+    workflow = graph.build_graph(speculative=True)
+
+    result = asyncio.run(workflow.ainvoke(initial_state("hi")))
+    assert result["response"] == "Hello"
+    # Answered once, by the responder node itself
+    assert len(started) == 1
+    assert "speculation_id" not in result
+    assert gate.in_flight == gate.limit
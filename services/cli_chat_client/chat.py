@@ -1,8 +1,11 @@
 #!/usr/bin/env python
+import argparse
 import asyncio
+import json
+import random
+import time
 import httpx
 import uuid
-from typing import List
 
 BACKEND_URL = "http://localhost:8000"
 
@@ -12,7 +15,8 @@ async def chat_loop():
     print("Type 'exit' to quit")
     print("-" * 50)
 
-    history: List[str] = []
+    # The backend keeps the conversation; each request carries only the new message
+    session_id = str(uuid.uuid4())
     client = httpx.AsyncClient(base_url=BACKEND_URL)
 
     try:
@@ -26,7 +30,7 @@ async def chat_loop():
             message = {
                 "id": str(uuid.uuid4()),
                 "content": user_input,
-                "history": history,
+                "session_id": session_id,
             }
 
             try:
@@ -47,9 +51,6 @@ async def chat_loop():
                 else:
                     print("\nAssistant:", "No response received")
 
-                # Update history
-                history.append(user_input)
-
             except httpx.HTTPError as e:
                 print(f"\nError communicating with backend: {str(e)}")
             except Exception as e:
@@ -59,5 +60,161 @@ async def chat_loop():
         await client.aclose()
 
 
+def load_prompts(path: str) -> list[str]:
+    """Read a corpus of one prompt per line, or JSONL with a ``prompt`` field."""
+    prompts = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            prompts.append(json.loads(line)["prompt"] if line[0] == "{" else line)
+    return prompts
+
+
+def percentile(samples: list[float], q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def timed_request(client: httpx.AsyncClient, prompt: str, stream: bool) -> dict:
+    """Send one prompt and time it; TTFT is the first ``token`` event when streaming."""
+    message = {"id": str(uuid.uuid4()), "content": prompt, "bypass_cache": True}
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if stream:
+            error = None
+            async with client.stream("POST", "/chat/stream", json=message) as response:
+                response.raise_for_status()
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                        if event == "token" and ttft is None:
+                            ttft = time.perf_counter() - start
+                        elif event == "error":
+                            error = "error event"
+                    elif line.startswith("data: ") and event == "done":
+                        # A run that failed inside the workflow still ends
+                        # with ``done``, reporting the error in its payload
+                        error = error or json.loads(line[6:]).get("error")
+        else:
+            response = await client.post("/chat", json=message)
+            response.raise_for_status()
+            error = response.json().get("error")
+    except httpx.HTTPStatusError as e:
+        error = f"HTTP {e.response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    return {"latency": time.perf_counter() - start, "ttft": ttft, "error": error}
+
+
+async def run_load(
+    prompts: list[str],
+    concurrency: int,
+    rps: float | None,
+    requests: int,
+    stream: bool,
+) -> dict:
+    """Replay ``prompts`` and summarize latency, time to first token and throughput.
+
+    With ``rps`` requests are started on a Poisson schedule regardless of how
+    many are outstanding (open loop); otherwise ``concurrency`` workers each
+    send the next prompt as soon as their last one finishes (closed loop).
+    """
+    results: list[dict] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+        base_url=BACKEND_URL, timeout=httpx.Timeout(600.0), limits=limits
+    ) as client:
+        start = time.perf_counter()
+        if rps:
+            tasks = []
+            for i in range(requests):
+                prompt = prompts[i % len(prompts)]
+                tasks.append(asyncio.create_task(timed_request(client, prompt, stream)))
+                await asyncio.sleep(random.expovariate(rps))
+            results = await asyncio.gather(*tasks)
+        else:
+            sent = iter(range(requests))
+
+            async def worker():
+                for i in sent:
+                    prompt = prompts[i % len(prompts)]
+                    results.append(await timed_request(client, prompt, stream))
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": elapsed,
+        "rps": len(ok) / elapsed if elapsed else 0.0,
+        **{f"latency_p{q}": percentile(latencies, q / 100) for q in (50, 95, 99)},
+        **{f"ttft_p{q}": percentile(ttfts, q / 100) for q in (50, 95, 99)},
+    }
+
+
+def print_report(report: dict) -> None:
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}ms"
+
+    print(
+        f"{report['requests']} requests, {report['errors']} errors in "
+        f"{report['seconds']:.1f}s ({report['rps']:.2f} req/s)"
+    )
+    for metric in ("latency", "ttft"):
+        print(
+            f"  {metric:8} p50 {ms(report[f'{metric}_p50'])}"
+            f"  p95 {ms(report[f'{metric}_p95'])}  p99 {ms(report[f'{metric}_p99'])}"
+        )
+
+
+def main():
+    global BACKEND_URL
+    parser = argparse.ArgumentParser(description="LLM Flow chat client")
+    parser.add_argument("--url", default=BACKEND_URL)
+    parser.add_argument(
+        "--load", metavar="PROMPTS", help="Replay a prompt corpus instead of chatting"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rps", type=float, help="Open-loop arrival rate instead of --concurrency"
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Use /chat instead of /chat/stream (no time to first token)",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write the report here")
+    args = parser.parse_args()
+    BACKEND_URL = args.url
+
+    if not args.load:
+        asyncio.run(chat_loop())
+        return
+    report = asyncio.run(
+        run_load(
+            load_prompts(args.load),
+            args.concurrency,
+            args.rps,
+            args.requests,
+            stream=not args.no_stream,
+        )
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
 if __name__ == "__main__":
-    asyncio.run(chat_loop())
+    main()
@@ -25,7 +25,7 @@ else
 fi
 
 # Test backend health endpoint
-RESPONSE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/health 2>/dev/null)
+RESPONSE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/health/ready 2>/dev/null)
 if [ "$RESPONSE" = "200" ]; then
     echo -e "${GREEN}✓${NC} Backend health check passed"
 else
@@ -43,8 +43,8 @@ else
 fi
 
 # Check Web Search Tool
-if nc -z localhost 7001 2>/dev/null; then
-    echo -e "${GREEN}✓${NC} Web Search Tool (port 7001) is accessible"
+if nc -z localhost 7003 2>/dev/null; then
+    echo -e "${GREEN}✓${NC} Web Search Tool (port 7003) is accessible"
 else
     echo -e "${YELLOW}!${NC} Web Search Tool is not accessible - backend may have limited functionality"
 fi
@@ -0,0 +1,172 @@
+"""Content-hash keyed embedding cache with an in-memory LRU and an mmap-backed disk tier."""
+
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+
+class EmbeddingCache:
+    """Caches embeddings by ``sha256(model, text)``.
+
+    The disk tier is two append-only files in ``path``:
+
+    * ``vectors.f32`` – raw float32 rows of ``dim`` values, read through
+      ``np.memmap`` so every worker process shares the same page cache
+      instead of holding its own copy;
+    * ``index.txt`` – one ``<key> <row>`` line per stored vector.
+
+    Appends are serialized across processes with ``flock``. The vector row is
+    written before its index line, so readers only ever see complete rows.
+    A writer that crashed mid-append can leave a partial row or index line
+    behind; the next append truncates both files back to a whole record
+    first, so later rows stay aligned.
+
+    The methods do file I/O and may block on the lock, so async callers run
+    them in a worker thread; the in-process state is guarded by a lock.
+    """
+
+    def __init__(self, path: str, dim: int, model: str, memory_entries: int = 10000):
+        self.dim = dim
+        self.model = model
+        self.memory_entries = memory_entries
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.txt"
+        self.lock_path = self.dir / "lock"
+        self.vectors_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._rows: dict[str, int] = {}
+        self._index_offset = 0
+        self._index_stat: tuple[int, int] = (-1, -1)
+        self._lock = threading.Lock()
+        self._mmap: Optional[np.memmap] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._refresh_index()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _refresh_index(self) -> None:
+        """Read index lines appended (by any process) since the last refresh.
+
+        The file is only read when its size or mtime changed, so a miss
+        usually costs a ``stat`` rather than a read.
+        """
+        st = os.stat(self.index_path)
+        if (st.st_size, st.st_mtime_ns) == self._index_stat:
+            return
+        self._index_stat = (st.st_size, st.st_mtime_ns)
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            key, row = line.split()
+            self._rows[key.decode()] = int(row)
+        self._index_offset += end
+
+    def _row(self, row: int) -> np.ndarray:
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            self._mmap = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+        return self._mmap[row]
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            row = self._rows.get(key)
+            if row is None:
+                self._refresh_index()
+                row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            vector = np.array(self._row(row))
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+
+    def get_many(self, texts: list[str]) -> list[Optional[np.ndarray]]:
+        return [self.get(text) for text in texts]
+
+    def _truncate_torn_writes(self) -> None:
+        """Cut a partial trailing row or index line left by a crashed writer.
+
+        Called with the file lock held, before appending.
+        """
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.vectors_path)
+        if size % row_bytes:
+            os.truncate(self.vectors_path, size - size % row_bytes)
+        with open(self.index_path, "rb+") as f:
+            # Index lines are short; the last newline is within the tail
+            tail_start = max(f.seek(0, os.SEEK_END) - 4096, 0)
+            f.seek(tail_start)
+            tail = f.read()
+            if tail and not tail.endswith(b"\n"):
+                f.truncate(tail_start + tail.rfind(b"\n") + 1)
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        entries = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                if key not in self._rows:
+                    entries.append((key, vector))
+        if not entries:
+            return
+        with open(self.lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._truncate_torn_writes()
+                with self._lock:
+                    self._refresh_index()
+                    entries = [(k, v) for k, v in entries if k not in self._rows]
+                first_row = os.path.getsize(self.vectors_path) // (self.dim * 4)
+                with open(self.vectors_path, "ab") as f:
+                    f.write(b"".join(v.tobytes() for _, v in entries))
+                lines = []
+                for offset, (key, _) in enumerate(entries):
+                    lines.append(f"{key} {first_row + offset}\n")
+                with open(self.index_path, "a") as f:
+                    f.write("".join(lines))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        with self._lock:
+            self._refresh_index()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._rows),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
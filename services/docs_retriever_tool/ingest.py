@@ -0,0 +1,281 @@
+"""Streaming document ingestion into the docs collection.
+
+Files are streamed from a directory, chunked in a process pool, embedded in
+large batches with bounded concurrency and upserted to Qdrant in bulk. Memory
+stays bounded because at most ``workers * 4`` files and ``concurrency``
+batches are in flight at any time; the producer waits when that window is
+full. Chunks whose content hash is already stored are skipped. Term counts
+for the local BM25 index are computed in the same worker processes and merged
+into the index as batches land in Qdrant.
+
+Usage:
+    python ingest.py /path/to/docs [--chunk-size 1000] [--batch-size 256]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator
+from qdrant_client import models
+from lexical_index import BM25Index, term_counts
+
+logger = logging.getLogger("ingest")
+
+DEFAULT_SUFFIXES = (".txt", ".md", ".rst")
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    upserted: int = 0
+    lexical_backfilled: int = 0
+    failed_batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "skipped_unchanged": self.skipped,
+            "upserted": self.upserted,
+            "lexical_backfilled": self.lexical_backfilled,
+            "failed_batches": self.failed_batches,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(self.files / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def iter_files(root: str, suffixes: tuple[str, ...]) -> Iterator[str]:
+    """Lazily walk ``root`` so huge corpora are never listed up front."""
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(suffixes):
+                yield os.path.join(dirpath, name)
+
+
+@lru_cache(maxsize=4)
+def _splitter(chunk_size: int, chunk_overlap: int):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def chunk_file(path: str, chunk_size: int, chunk_overlap: int) -> list[dict]:
+    """Read and split one file; runs inside a worker process."""
+    text = Path(path).read_text(encoding="utf-8", errors="ignore")
+    chunks = _splitter(chunk_size, chunk_overlap).split_text(text)
+    return [
+        {
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{path}#{i}")),
+            "text": chunk,
+            "metadata": {
+                "source": path,
+                "chunk_index": i,
+                "content_hash": hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
+            },
+            "terms": term_counts(chunk),
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+async def _drop_unchanged(qdrant, collection: str, batch: list[dict]) -> list[dict]:
+    """Remove chunks whose point already stores the same content hash."""
+    existing = await qdrant.retrieve(
+        collection,
+        ids=[c["id"] for c in batch],
+        with_payload=["metadata"],
+        with_vectors=False,
+    )
+    stored = {
+        str(p.id): (p.payload or {}).get("metadata", {}).get("content_hash")
+        for p in existing
+    }
+    return [c for c in batch if stored.get(c["id"]) != c["metadata"]["content_hash"]]
+
+
+async def _process_batch(
+    batch: list[dict],
+    embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+    qdrant,
+    collection: str,
+    stats: IngestStats,
+    indexed: list[tuple[str, dict[str, int]]],
+    lexical_index: BM25Index | None = None,
+) -> None:
+    try:
+        fresh = await _drop_unchanged(qdrant, collection, batch)
+        stats.skipped += len(batch) - len(fresh)
+        if lexical_index is not None:
+            # Unchanged in Qdrant but unknown to BM25, e.g. ingested before the
+            # index existed or after its file was lost: index them anyway
+            fresh_ids = {c["id"] for c in fresh}
+            missing = [
+                c
+                for c in batch
+                if c["id"] not in fresh_ids and c["id"] not in lexical_index
+            ]
+            stats.lexical_backfilled += len(missing)
+            indexed.extend((c["id"], c["terms"]) for c in missing)
+        if not fresh:
+            return
+        vectors = await embed([c["text"] for c in fresh])
+        await qdrant.upsert(
+            collection,
+            points=[
+                models.PointStruct(
+                    id=c["id"],
+                    vector=vector,
+                    # Same payload layout as langchain_qdrant
+                    payload={"page_content": c["text"], "metadata": c["metadata"]},
+                )
+                for c, vector in zip(fresh, vectors)
+            ],
+            wait=True,
+        )
+        stats.upserted += len(fresh)
+        indexed.extend((c["id"], c["terms"]) for c in fresh)
+    except Exception as e:
+        stats.failed_batches += 1
+        logger.error(f"Failed to ingest batch of {len(batch)} chunks: {str(e)}")
+
+
+async def ingest_directory(
+    root: str,
+    embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+    qdrant,
+    collection: str,
+    suffixes: tuple[str, ...] = DEFAULT_SUFFIXES,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    workers: int | None = None,
+    batch_size: int = 256,
+    concurrency: int = 4,
+    log_every: int = 1000,
+    lexical_index: BM25Index | None = None,
+    lexical_merge_every: int = 50000,
+) -> dict:
+    """Ingest every matching file under ``root`` and return throughput stats."""
+    workers = workers or os.cpu_count() or 1
+    stats = IngestStats()
+    # Term counts of upserted chunks waiting to be merged into the BM25 index
+    indexed: list[tuple[str, dict[str, int]]] = []
+
+    async def merge_lexical() -> None:
+        # Merging rebuilds the posting arrays; keep that CPU work off the loop
+        docs = list(indexed)
+        indexed.clear()
+        if lexical_index is not None and docs:
+            await asyncio.to_thread(lexical_index.update, docs)
+
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(concurrency)
+    tasks: set[asyncio.Task] = set()
+    batch: list[dict] = []
+
+    async def flush(chunks: list[dict]) -> None:
+        # Blocks the producer while ``concurrency`` batches are still running
+        await in_flight.acquire()
+        task = asyncio.create_task(
+            _process_batch(
+                chunks, embed, qdrant, collection, stats, indexed, lexical_index
+            )
+        )
+        tasks.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            tasks.discard(t)
+            in_flight.release()
+
+        task.add_done_callback(done)
+
+    async def consume(future) -> None:
+        nonlocal batch
+        try:
+            chunks = await future
+        except Exception as e:
+            logger.warning(f"Skipping unreadable file: {str(e)}")
+            return
+        stats.files += 1
+        stats.chunks += len(chunks)
+        batch.extend(chunks)
+        while len(batch) >= batch_size:
+            await flush(batch[:batch_size])
+            batch = batch[batch_size:]
+        if len(indexed) >= lexical_merge_every:
+            await merge_lexical()
+        if stats.files % log_every == 0:
+            logger.info(f"Progress: {stats.as_dict()}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for path in iter_files(root, suffixes):
+            pending.append(
+                loop.run_in_executor(pool, chunk_file, path, chunk_size, chunk_overlap)
+            )
+            if len(pending) >= workers * 4:
+                await consume(pending.popleft())
+        while pending:
+            await consume(pending.popleft())
+    if batch:
+        await flush(batch)
+    await asyncio.gather(*tasks)
+    await merge_lexical()
+    if lexical_index is not None:
+        await asyncio.to_thread(lexical_index.save)
+
+    result = stats.as_dict()
+    logger.info(f"Ingestion finished: {result}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest documents into Qdrant.")
+    parser.add_argument("root", help="Directory to ingest recursively")
+    parser.add_argument("--suffixes", nargs="+", default=list(DEFAULT_SUFFIXES))
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(name)s - %(message)s"
+    )
+    # Reuse the service's pooled clients, embedding cache and collection setup
+    from server import COLLECTION_NAME, async_client, embed_texts, lexical_index
+
+    asyncio.run(
+        ingest_directory(
+            args.root,
+            embed_texts,
+            async_client,
+            COLLECTION_NAME,
+            suffixes=tuple(args.suffixes),
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            lexical_index=lexical_index,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
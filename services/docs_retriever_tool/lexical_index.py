@@ -0,0 +1,244 @@
+"""Local BM25 inverted index stored alongside the Qdrant docs collection."""
+
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+
+# Keeps identifiers such as "ERR-404", "v1.2.3" or "foo_bar" as single tokens
+TOKEN_RE = re.compile(r"\w+(?:[-.:/]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def term_counts(text: str) -> dict[str, int]:
+    return dict(Counter(tokenize(text)))
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[list[str]], k: int, constant: int = 60
+) -> list[str]:
+    """Fuse ranked id lists with RRF: ``score(d) = sum(1 / (constant + rank))``."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (constant + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Encode strings as one UTF-8 blob plus ``len(strings) + 1`` byte offsets."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = blob.tobytes()
+    bounds = offsets.tolist()
+    return [raw[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+
+class BM25Index:
+    """BM25 over point ids, kept as CSR posting lists.
+
+    On disk the index is a single ``.npz`` with the vocabulary and point ids
+    (each a UTF-8 blob plus offsets), per-term posting offsets, int32
+    document indices and uint16 term frequencies. On load the BM25 weight of
+    every posting is precomputed, so a query only gathers the postings of
+    its terms and sums them per document.
+
+    ``update`` may run in a worker thread while the event loop searches: it
+    builds new arrays and swaps them in under a lock, and ``search`` reads a
+    consistent snapshot.
+    """
+
+    def __init__(self, path: str | None = None, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self.vocab: dict[str, int] = {}
+        self.doc_keys: list[str] = []
+        self.doc_lens = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tfs = np.zeros(0, dtype=np.uint16)
+        self._weights = np.zeros(0, dtype=np.float32)
+        self._positions: dict[str, int] = {}
+        self._mtime = 0.0
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.doc_keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    def _weights_for(
+        self,
+        doc_lens: np.ndarray,
+        offsets: np.ndarray,
+        post_docs: np.ndarray,
+        post_tfs: np.ndarray,
+    ) -> np.ndarray:
+        n_docs = len(doc_lens)
+        if n_docs == 0:
+            return np.zeros(0, dtype=np.float32)
+        df = np.diff(offsets)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        posting_terms = np.repeat(np.arange(len(df)), df)
+        tf = post_tfs.astype(np.float32)
+        dl = doc_lens[post_docs].astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * dl / max(doc_lens.mean(), 1.0))
+        return idf[posting_terms] * tf * (self.k1 + 1) / (tf + norm)
+
+    def _install(
+        self,
+        vocab: dict[str, int],
+        doc_keys: list[str],
+        doc_lens: np.ndarray,
+        offsets: np.ndarray,
+        post_docs: np.ndarray,
+        post_tfs: np.ndarray,
+    ) -> None:
+        """Derive the weights, then swap the whole index in at once."""
+        weights = self._weights_for(doc_lens, offsets, post_docs, post_tfs)
+        positions = {key: i for i, key in enumerate(doc_keys)}
+        with self._lock:
+            self.vocab = vocab
+            self.doc_keys = doc_keys
+            self.doc_lens = doc_lens
+            self.offsets = offsets
+            self.post_docs = post_docs
+            self.post_tfs = post_tfs
+            self._weights = weights
+            self._positions = positions
+
+    def update(self, docs: Iterable[tuple[str, dict[str, int]]]) -> None:
+        """Add or replace documents given as ``(point id, term counts)``."""
+        with self._lock:
+            vocab = dict(self.vocab)
+            positions = dict(self._positions)
+            keys = list(self.doc_keys)
+            doc_lens, offsets = self.doc_lens, self.offsets
+            post_docs, post_tfs = self.post_docs, self.post_tfs
+        live = [True] * len(keys)
+        terms, doc_idx, tfs, lens = [], [], [], []
+        for key, counts in docs:
+            old = positions.get(key)
+            if old is not None:
+                live[old] = False
+            positions[key] = len(keys)
+            keys.append(key)
+            live.append(True)
+            lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                terms.append(vocab.setdefault(term, len(vocab)))
+                doc_idx.append(len(keys) - 1)
+                tfs.append(min(tf, 65535))
+        if not lens:
+            return
+
+        old_terms = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        all_terms = np.concatenate([old_terms, np.asarray(terms, dtype=np.int64)])
+        all_docs = np.concatenate([post_docs, np.asarray(doc_idx, np.int32)])
+        all_tfs = np.concatenate([post_tfs, np.asarray(tfs, np.uint16)])
+        all_lens = np.concatenate([doc_lens, np.asarray(lens, np.int32)])
+
+        # Drop replaced documents and renumber the survivors densely
+        live_mask = np.asarray(live, dtype=bool)
+        remap = np.cumsum(live_mask) - 1
+        keep = live_mask[all_docs]
+        all_terms, all_docs, all_tfs = all_terms[keep], all_docs[keep], all_tfs[keep]
+        order = np.argsort(all_terms, kind="stable")
+        counts_per_term = np.bincount(all_terms, minlength=len(vocab))
+        self._install(
+            vocab,
+            [k for k, alive in zip(keys, live) if alive],
+            all_lens[live_mask],
+            np.concatenate([[0], np.cumsum(counts_per_term)]).astype(np.int64),
+            remap[all_docs[order]].astype(np.int32),
+            all_tfs[order],
+        )
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        self.maybe_reload()
+        with self._lock:
+            vocab, doc_keys, offsets = self.vocab, self.doc_keys, self.offsets
+            post_docs, weights = self.post_docs, self._weights
+        term_ids = {vocab[t] for t in tokenize(query) if t in vocab}
+        if not term_ids or not doc_keys:
+            return []
+        idx = np.concatenate([np.arange(offsets[t], offsets[t + 1]) for t in term_ids])
+        if idx.size == 0:
+            return []
+        docs, inverse = np.unique(post_docs[idx], return_inverse=True)
+        scores = np.bincount(inverse, weights=weights[idx])
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(doc_keys[docs[i]], float(scores[i])) for i in top]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            vocab, doc_keys, doc_lens = self.vocab, self.doc_keys, self.doc_lens
+            offsets, post_docs, post_tfs = self.offsets, self.post_docs, self.post_tfs
+        term_blob, term_offsets = pack_strings(sorted(vocab, key=vocab.get))
+        key_blob, key_offsets = pack_strings(doc_keys)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                term_blob=term_blob,
+                term_offsets=term_offsets,
+                key_blob=key_blob,
+                key_offsets=key_offsets,
+                doc_lens=doc_lens,
+                offsets=offsets,
+                post_docs=post_docs,
+                post_tfs=post_tfs,
+            )
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def load(self) -> None:
+        mtime = self.path.stat().st_mtime
+        with np.load(self.path) as data:
+            if "term_blob" in data.files:
+                terms = unpack_strings(data["term_blob"], data["term_offsets"])
+                doc_keys = unpack_strings(data["key_blob"], data["key_offsets"])
+            else:
+                # Indexes written before strings were packed
+                terms = data["terms"].tolist()
+                doc_keys = data["doc_keys"].tolist()
+            self._install(
+                {t: i for i, t in enumerate(terms)},
+                doc_keys,
+                data["doc_lens"],
+                data["offsets"],
+                data["post_docs"],
+                data["post_tfs"],
+            )
+        self._mtime = mtime
+
+    def maybe_reload(self) -> None:
+        """Pick up an index rewritten by another process (e.g. the ingest CLI)."""
+        if self.path is None:
+            return
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self.load()
@@ -1,36 +1,230 @@
 import os, asyncio, json
+import httpx
 from fastmcp import FastMCP
-from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from openai import AsyncOpenAI
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+from embedding_cache import EmbeddingCache
+from ingest import DEFAULT_SUFFIXES, ingest_directory
+from lexical_index import BM25Index, reciprocal_rank_fusion
 
 VECTOR_DB_URL = os.environ.get("VECTOR_DB_URL", "http://vector_db:6333")
-embeddings = OpenAIEmbeddings()
-client = QdrantClient(url=VECTOR_DB_URL)
+COLLECTION_NAME = "docs"
+# Same default model as langchain's OpenAIEmbeddings, so existing points stay valid
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "1536"))
+# Directory of the persistent embedding cache; set to an empty string to disable
+EMBEDDING_CACHE_DIR = os.environ.get(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache"),
+)
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(
+    os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000")
+)
+# BM25 index built during ingestion, used by the lexical and hybrid modes
+LEXICAL_INDEX_PATH = os.environ.get(
+    "LEXICAL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lexical_index.npz"),
+)
+# Upper bound on inputs per embeddings request (OpenAI accepts up to 2048)
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "512"))
+# Keep-alive connection pool shared by all requests to each upstream
+MAX_CONNECTIONS = int(os.environ.get("RETRIEVER_MAX_CONNECTIONS", "32"))
+# In-flight request caps; excess callers wait instead of overloading upstreams
+MAX_CONCURRENT_EMBEDDINGS = int(os.environ.get("MAX_CONCURRENT_EMBEDDINGS", "16"))
+MAX_CONCURRENT_SEARCHES = int(os.environ.get("MAX_CONCURRENT_SEARCHES", "32"))
+
+pool_limits = httpx.Limits(
+    max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS
+)
+openai_client = AsyncOpenAI(http_client=httpx.AsyncClient(limits=pool_limits))
+async_client = AsyncQdrantClient(url=VECTOR_DB_URL, limits=pool_limits)
+embedding_limit = asyncio.Semaphore(MAX_CONCURRENT_EMBEDDINGS)
+search_limit = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+embedding_cache = (
+    EmbeddingCache(
+        EMBEDDING_CACHE_DIR,
+        dim=EMBEDDING_DIM,
+        model=EMBEDDING_MODEL,
+        memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+    )
+    if EMBEDDING_CACHE_DIR
+    else None
+)
+lexical_index = BM25Index(LEXICAL_INDEX_PATH)
 
 # Create collection if it doesn't exist
+client = QdrantClient(url=VECTOR_DB_URL)
 try:
-    client.get_collection("docs")
+    client.get_collection(COLLECTION_NAME)
 except:
     client.create_collection(
-        collection_name="docs", vectors_config={"size": 1536, "distance": "Cosine"}
+        collection_name=COLLECTION_NAME,
+        vectors_config={"size": EMBEDDING_DIM, "distance": "Cosine"},
     )
 
-vector_store = QdrantVectorStore(
-    client=client,
-    collection_name="docs",
-    embedding=embeddings,
+app = FastMCP(name="docs_retriever_tool")
+
+
+async def _embed_batch(texts: list[str]) -> list[list[float]]:
+    async with embedding_limit:
+        resp = await openai_client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+async def _embed_uncached(texts: list[str]) -> list[list[float]]:
+    batches = [
+        texts[i : i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(*(_embed_batch(b) for b in batches))
+    return [vector for batch in results for vector in batch]
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts in as few requests as possible, preserving order.
+
+    Texts already in the embedding cache are served from it; only the
+    distinct misses are sent to the embeddings API. The cache's disk tier
+    reads files and takes a cross-process lock, so it runs off the event loop.
+    """
+    if embedding_cache is None:
+        return await _embed_uncached(texts)
+    cached = await asyncio.to_thread(embedding_cache.get_many, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+    fresh = {}
+    if missing:
+        vectors = await _embed_uncached(missing)
+        await asyncio.to_thread(embedding_cache.put_many, missing, vectors)
+        fresh = dict(zip(missing, vectors))
+    return [
+        vector.tolist() if vector is not None else fresh[text]
+        for text, vector in zip(texts, cached)
+    ]
+
+
+def _text(point) -> str:
+    # Points are stored in langchain_qdrant's payload layout
+    return (point.payload or {}).get("page_content", "")
+
+
+async def _vector_search(queries: list[str], limit: int) -> list[list]:
+    vectors = await embed_texts(queries)
+    async with search_limit:
+        if len(vectors) == 1:
+            res = await async_client.query_points(
+                COLLECTION_NAME, query=vectors[0], limit=limit, with_payload=True
+            )
+            return [res.points]
+        responses = await async_client.query_batch_points(
+            COLLECTION_NAME,
+            requests=[
+                models.QueryRequest(query=vector, limit=limit, with_payload=True)
+                for vector in vectors
+            ],
+        )
+    return [res.points for res in responses]
+
+
+async def search(queries: list[str], k: int, mode: str) -> list[list[str]]:
+    """Return the top ``k`` passages per query.
+
+    ``vector`` is pure cosine search, ``lexical`` uses the local BM25 index and
+    ``hybrid`` fuses a deeper candidate list from both with reciprocal-rank
+    fusion.
+    """
+    if mode not in ("vector", "lexical", "hybrid"):
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    if mode == "vector":
+        hits = await _vector_search(queries, k)
+        return [[_text(p) for p in points] for points in hits]
+
+    depth = max(k * 4, 20)
+    if mode == "hybrid":
+        vector_hits = await _vector_search(queries, depth)
+    else:
+        vector_hits = [[] for _ in queries]
+    texts = {str(p.id): _text(p) for points in vector_hits for p in points}
+    ranked = [
+        reciprocal_rank_fusion(
+            [
+                [str(p.id) for p in points],
+                [key for key, _ in lexical_index.search(query, depth)],
+            ],
+            k,
+        )
+        for query, points in zip(queries, vector_hits)
+    ]
+    # Lexical-only hits still need their text from Qdrant
+    missing = list({key for keys in ranked for key in keys if key not in texts})
+    if missing:
+        async with search_limit:
+            points = await async_client.retrieve(
+                COLLECTION_NAME, ids=missing, with_payload=True
+            )
+        texts.update({str(p.id): _text(p) for p in points})
+    return [[texts[key] for key in keys if key in texts] for keys in ranked]
+
+
+@app.tool(
+    name="retrieve_docs",
+    description="Search indexed documents (mode: vector, lexical or hybrid).",
 )
+async def retrieve(query: str, k: int = 4, mode: str = "vector"):
+    [passages] = await search([query], k, mode)
+    return {"passages": passages}
 
-app = FastMCP(name="docs_retriever_tool")
+
+@app.tool(
+    name="retrieve_docs_batch",
+    description="Semantic search for many queries with one embeddings call and one batch search.",
+)
+async def retrieve_batch(queries: list[str], k: int = 4, mode: str = "vector"):
+    if not queries:
+        return {"results": []}
+    results = await search(queries, k, mode)
+    return {
+        "results": [
+            {"query": query, "passages": passages}
+            for query, passages in zip(queries, results)
+        ]
+    }
 
 
-@app.tool(name="retrieve_docs", description="Semantic search over indexed documents.")
-async def retrieve(query: str, k: int = 4):
-    docs = vector_store.similarity_search(query, k=k)
-    return {"passages": [d.page_content for d in docs]}
+@app.tool(
+    name="ingest_docs",
+    description="Chunk, embed and index every document under a directory.",
+)
+async def ingest(
+    path: str,
+    suffixes: list[str] = list(DEFAULT_SUFFIXES),
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    batch_size: int = 256,
+    concurrency: int = 4,
+):
+    return await ingest_directory(
+        path,
+        embed_texts,
+        async_client,
+        COLLECTION_NAME,
+        suffixes=tuple(suffixes),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        lexical_index=lexical_index,
+    )
+
+
+@app.tool(
+    name="embedding_cache_stats",
+    description="Hit/miss counters of the persistent embedding cache.",
+)
+async def cache_stats():
+    return embedding_cache.stats() if embedding_cache else {"enabled": False}
 
 
 if __name__ == "__main__":
-    asyncio.run(app.run_http_async(host="0.0.0.0", port=7002))
+    asyncio.run(
+        app.run_http_async(host="0.0.0.0", port=int(os.environ.get("PORT", "7002")))
+    )
@@ -1,21 +1,99 @@
-import os, httpx, asyncio
+import os, httpx, asyncio, time
+from collections import OrderedDict
 from fastmcp import FastMCP
 
 SERPER_API_KEY = os.environ.get("SERPER_API_KEY")
+SERPER_URL = os.environ.get("SERPER_URL", "https://google.serper.dev/search")
+# Number of results returned to the caller unless it asks for another top_n
+SEARCH_TOP_N = int(os.environ.get("SEARCH_TOP_N", "5"))
+# Search results go stale quickly, so keep them only briefly
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+SEARCH_MAX_CONNECTIONS = int(os.environ.get("SEARCH_MAX_CONNECTIONS", "20"))
+
+# One pooled client for the lifetime of the process instead of one per call
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0),
+    limits=httpx.Limits(
+        max_connections=SEARCH_MAX_CONNECTIONS,
+        max_keepalive_connections=SEARCH_MAX_CONNECTIONS,
+    ),
+)
+
+# normalized query -> (expires_at, trimmed results)
+cache: "OrderedDict[str, tuple[float, list[dict]]]" = OrderedDict()
+# normalized query -> upstream request shared by concurrent identical searches
+in_flight: dict[str, asyncio.Task] = {}
+stats = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0}
 
 app = FastMCP(name="web_search_tool")
 
 
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def trim_results(payload: dict) -> list[dict]:
+    """Keep only what the LLM needs from Serper's organic results."""
+    return [
+        {
+            "title": item.get("title", ""),
+            "snippet": item.get("snippet", ""),
+            "url": item.get("link", ""),
+        }
+        for item in payload.get("organic", [])
+    ]
+
+
+async def fetch_results(query: str) -> list[dict]:
+    stats["upstream_calls"] += 1
+    response = await http_client.post(
+        SERPER_URL,
+        headers={"X-API-KEY": SERPER_API_KEY},
+        json={"q": query},
+    )
+    response.raise_for_status()
+    return trim_results(response.json())
+
+
+async def cached_search(query: str) -> list[dict]:
+    key = normalize_query(query)
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        cache.move_to_end(key)
+        stats["hits"] += 1
+        return entry[1]
+
+    task = in_flight.get(key)
+    if task is None:
+        stats["misses"] += 1
+        task = asyncio.create_task(fetch_results(query))
+        in_flight[key] = task
+        task.add_done_callback(lambda _: in_flight.pop(key, None))
+    else:
+        stats["coalesced"] += 1
+    # Shield so one caller going away does not cancel the shared request
+    results = await asyncio.shield(task)
+
+    cache[key] = (time.time() + SEARCH_CACHE_TTL_SECONDS, results)
+    cache.move_to_end(key)
+    while len(cache) > SEARCH_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+    return results
+
+
 @app.tool(name="web_search", description="Search the web for information")
-async def search(query: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://google.serper.dev/search",
-            headers={"X-API-KEY": SERPER_API_KEY},
-            json={"q": query},
-        )
-        return response.json()
+async def search(query: str, top_n: int = SEARCH_TOP_N):
+    results = await cached_search(query)
+    return {"results": results[:top_n]}
+
+
+@app.tool(name="web_search_stats", description="Cache and coalescing counters")
+async def search_stats():
+    return {**stats, "cached_queries": len(cache), "in_flight": len(in_flight)}
 
 
 if __name__ == "__main__":
-    asyncio.run(app.run_http_async(host="0.0.0.0", port=7003))
+    asyncio.run(
+        app.run_http_async(host="0.0.0.0", port=int(os.environ.get("PORT", "7003")))
+    )